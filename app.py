@@ -1,25 +1,222 @@
-from flask import Flask, request, jsonify, render_template
-from terminal import UnifiedTerminal
+from flask import Flask, Response, request, jsonify, render_template, g
+from sessions import SessionManager, new_session_id, valid_session_id
+from jobs import JobManager
+from monitoring import PSUTIL_AVAILABLE, get_cpu_sampler, get_metrics_recorder, parse_duration
+from prometheus import REGISTRY
 from flask_cors import CORS
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os  # <-- Added for Render port
+import time
+
+SESSION_COOKIE = "terminal_session"
+# Clients without a cookie jar can keep a session by sending its id here; new
+# sessions get their id back in the same response header
+SESSION_HEADER = "X-Terminal-Session"
 
 app = Flask(__name__)
-CORS(app)  # Allow cross-origin requests
-terminal = UnifiedTerminal()
+CORS(app, expose_headers=[SESSION_HEADER])  # Allow cross-origin requests
+# grep's worker processes are spawned and re-run the main script as
+# __mp_main__; only the server process creates sessions, pools and samplers
+if __name__ != "__mp_main__":
+    sessions = SessionManager(
+        max_sessions=int(os.environ.get("TERMINAL_MAX_SESSIONS", 64)),
+        idle_timeout=float(os.environ.get("TERMINAL_SESSION_IDLE_SECONDS", 30 * 60)),
+    )
+    jobs = JobManager(max_workers=int(os.environ.get("TERMINAL_JOB_WORKERS", 8)))
+    batch_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("TERMINAL_BATCH_WORKERS", 8)),
+                                    thread_name_prefix="batch")
+    if PSUTIL_AVAILABLE:
+        # Start sampling as soon as the server is up
+        get_metrics_recorder()
+        get_cpu_sampler()
+BATCH_MAX_COMMANDS = int(os.environ.get("TERMINAL_BATCH_MAX_COMMANDS", 100))
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "terminal_http_requests_total", "HTTP requests served", labels=("method", "endpoint", "status"))
+REGISTRY.gauge("terminal_sessions", "Terminal sessions held in memory", lambda: len(sessions))
+if PSUTIL_AVAILABLE:
+    import psutil
+
+    def host_memory():
+        mem = psutil.virtual_memory()
+        return {("total",): mem.total, ("used",): mem.used, ("available",): mem.available}
+
+    REGISTRY.gauge("terminal_host_cpu_percent", "Host CPU usage over the last second",
+                   lambda: get_cpu_sampler().average(1))
+    REGISTRY.gauge("terminal_host_memory_bytes", "Host memory", host_memory, labels=("kind",))
+    REGISTRY.gauge("terminal_host_swap_percent", "Host swap usage",
+                   lambda: psutil.swap_memory().percent)
+
+# Each browser gets its own terminal (history, stats) keyed by a cookie, or
+# by the session header for clients that don't keep cookies
+@app.before_request
+def resolve_session():
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    g.new_session = not valid_session_id(session_id)
+    g.session_id = new_session_id() if g.new_session else session_id
+
+@app.after_request
+def store_session(response):
+    rule = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUESTS.inc(request.method, rule, response.status_code)
+    if g.get("new_session"):
+        response.set_cookie(SESSION_COOKIE, g.session_id, httponly=True, samesite="Lax")
+        response.headers[SESSION_HEADER] = g.session_id
+    return response
+
+def current_terminal():
+    """Hold this request's terminal for a with block, so it isn't evicted mid-use."""
+    return sessions.use(g.session_id, returning=not g.new_session)
 
 # Serve frontend
 @app.route('/')
 def home():
     return render_template('index.html')
 
-# Execute commands via POST
+# Execute commands via POST; with "async": true return a job id right away.
+# "format": "json" returns built-in results as structured data, not text
 @app.route('/execute', methods=['POST'])
 def execute_command():
     data = request.json
     cmd = data.get("command", "")
-    output = terminal.execute(cmd)
+    fmt = data.get("format", request.args.get("format", "text"))
+    if fmt not in ("text", "json"):
+        return jsonify({"error": "format must be 'text' or 'json'"}), 400
+    if data.get("async"):
+        # The job holds the session until it finishes or is cancelled
+        session = sessions.acquire(g.session_id, returning=not g.new_session)
+        job = jobs.submit(session.terminal, cmd, owner=g.session_id, format=fmt)
+        job.future.add_done_callback(lambda _: sessions.release(session))
+        return jsonify(job.to_dict()), 202
+    with current_terminal() as terminal:
+        if fmt == "json":
+            result = terminal.run_command(cmd)
+            return jsonify(result.to_json() if result else {"output": None})
+        output = terminal.execute(cmd)
     return jsonify({"output": output})
 
+def run_batch_command(terminal, command, fmt):
+    start = time.perf_counter()
+    result = terminal.run_command(command)
+    entry = {"command": command, "duration": time.perf_counter() - start}
+    if result is None:
+        entry.update(output=None, ok=True)
+        return entry
+    if fmt == "json":
+        entry.update(result.to_json())
+    elif result.ok:
+        entry["output"] = result.text()
+    else:
+        entry.update(output=None, error=result.error)
+    # A system command exiting non-zero counts as a failure too
+    entry["ok"] = result.ok and not (result.name == "system" and result.data["returncode"])
+    return entry
+
+# Run several commands in one request:
+# {"commands": ["mkdir out", {"command": "ls a", "independent": true}, ...],
+#  "stop_on_error": false, "format": "text"}
+# Commands run in order; consecutive ones marked independent run in parallel.
+@app.route('/execute/batch', methods=['POST'])
+def execute_batch():
+    data = request.json or {}
+    commands = data.get("commands")
+    fmt = data.get("format", request.args.get("format", "text"))
+    if fmt not in ("text", "json"):
+        return jsonify({"error": "format must be 'text' or 'json'"}), 400
+    if not isinstance(commands, list) or not commands:
+        return jsonify({"error": "commands must be a non-empty list"}), 400
+    if len(commands) > BATCH_MAX_COMMANDS:
+        return jsonify({"error": f"at most {BATCH_MAX_COMMANDS} commands per batch"}), 400
+
+    # Group the batch into steps: a single command, or a run of independent ones
+    steps = []
+    for item in commands:
+        if isinstance(item, str):
+            item = {"command": item}
+        if not isinstance(item, dict) or not isinstance(item.get("command"), str):
+            return jsonify({"error": "each command must be a string or {\"command\": ...}"}), 400
+        if item.get("independent") and steps and steps[-1][0]:
+            steps[-1][1].append(item["command"])
+        else:
+            steps.append((bool(item.get("independent")), [item["command"]]))
+
+    stop_on_error = bool(data.get("stop_on_error"))
+    results, stopped = [], False
+    start = time.perf_counter()
+    with current_terminal() as terminal:
+        for parallel, step in steps:
+            if stopped:
+                results.extend({"command": command, "skipped": True} for command in step)
+                continue
+            if parallel and len(step) > 1:
+                futures = [batch_pool.submit(run_batch_command, terminal, command, fmt)
+                           for command in step]
+                entries = [future.result() for future in futures]
+            else:
+                entries = [run_batch_command(terminal, step[0], fmt)]
+            results.extend(entries)
+            stopped = stop_on_error and not all(entry["ok"] for entry in entries)
+    return jsonify({"results": results, "stopped": stopped,
+                    "duration": time.perf_counter() - start})
+
+# Stream command output as Server-Sent Events: one "chunk" message per piece
+# of output, comment lines as keepalives, and a final "end" event
+# The command is POSTed rather than sent in the URL, where it would end up in
+# access logs and browser history
+@app.route('/execute/stream', methods=['POST'])
+def execute_stream():
+    cmd = (request.json or {}).get("command", "")
+    # Entered by the generator, so the session is held for as long as the
+    # response streams and released when it ends or the client goes away
+    held = current_terminal()
+
+    def events():
+        with held as terminal:
+            for chunk in terminal.execute_stream(cmd, idle_timeout=15):
+                if chunk:
+                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+                else:
+                    yield ": keepalive\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Status/result of an async job, or cancel it with DELETE
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    job = jobs.get(job_id, owner=g.session_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    if request.method == 'DELETE':
+        job.cancel()
+    return jsonify(job.to_dict())
+
+# Downsampled host metrics, e.g. /metrics/series?since=5m&points=60&names=cpu,mem
+@app.route('/metrics/series')
+def metrics_series():
+    if not PSUTIL_AVAILABLE:
+        return jsonify({"error": "psutil module not installed"}), 503
+    try:
+        since = parse_duration(request.args.get("since", "5m"))
+        points = int(request.args.get("points", 120))
+        names = request.args.get("names")
+        return jsonify(get_metrics_recorder().query(
+            since, points, names.split(",") if names else None))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+# Prometheus scrape endpoint
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+# Per-command call counts and cumulative latency across all sessions
+@app.route('/stats')
+def command_stats():
+    return jsonify(sessions.command_stats.snapshot())
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))  # Render assigns PORT dynamically
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Stress benchmark for concurrent /execute requests:
+- Serves app.py from a threaded WSGI server on a free local port
+- Fires thousands of requests from 1..N client threads, all on one session
+  (the worst case: one terminal, one history shard) and on one session each
+- Verifies every command landed in history exactly once, in whole lines
+- Reports requests/second for each client thread count; client and server
+  share one interpreter (and GIL), so absolute numbers are a lower bound
+
+Usage: python benchmarks/bench_concurrency.py [requests] [max_threads]
+"""
+
+import http.cookiejar
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+# sessions.HISTORY_DIR is resolved from the cwd at import time
+WORKDIR = tempfile.mkdtemp(prefix="terminal-bench-")
+os.chdir(WORKDIR)
+
+from werkzeug.serving import make_server
+
+from app import app, sessions
+from history import parse_entry
+
+
+def start_server():
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def new_client():
+    jar = http.cookiejar.CookieJar()
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar)), jar
+
+
+def post(opener, url, command):
+    body = json.dumps({"command": command}).encode()
+    req = urllib.request.Request(url + "/execute", data=body,
+                                 headers={"Content-Type": "application/json"})
+    with opener.open(req) as resp:
+        return json.load(resp)["output"]
+
+
+def check_history(session_ids, expected):
+    sessions.close()    # flush every writer
+    seen = Counter()
+    for session_id in session_ids:
+        with open(sessions.history_file(session_id)) as f:
+            for line in f:
+                ts, command = parse_entry(line.rstrip("\n"))
+                if not ts:
+                    raise AssertionError(f"malformed history line: {line!r}")
+                seen[command] += 1
+    if seen != expected:
+        missing = sum((expected - seen).values())
+        extra = sum((seen - expected).values())
+        raise AssertionError(f"history mismatch: {missing} missing, {extra} unexpected")
+
+
+def run(url, label, total, threads, shared):
+    clients = [new_client() for _ in range(1 if shared else threads)]
+    # Prime the cookies so every request below reuses an existing session
+    for opener, _ in clients:
+        post(opener, url, "pwd")
+    session_ids = [cookie.value for _, jar in clients for cookie in jar]
+
+    def worker(i):
+        opener = clients[i % len(clients)][0]
+        assert post(opener, url, f"echo {label}-{i}") == f"{label}-{i}"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, range(total)))
+    elapsed = time.perf_counter() - start
+
+    expected = Counter(f"echo {label}-{i}" for i in range(total))
+    expected["pwd"] = len(clients)
+    check_history(session_ids, expected)
+    return total / elapsed
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    server, url = start_server()
+    print(f"{total} requests per run, history under {WORKDIR}")
+    threads = 1
+    while threads <= max_threads:
+        for shared in (True, False):
+            label = f"t{threads}{'s' if shared else 'p'}"
+            rate = run(url, label, total, threads, shared)
+            mode = "one session " if shared else "per-thread  "
+            print(f"{threads:>3} threads  {mode} {rate:8.0f} req/s  history ok")
+        threads *= 2
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
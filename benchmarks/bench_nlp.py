@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for NLP phrase matching:
+- Compares the old sequential re.match loop with NLPMatcher
+- Runs against the 15 built-in patterns and a 1,000-pattern synthetic table
+
+Usage: python benchmarks/bench_nlp.py [iterations]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from nlp_terminal import DEFAULT_NLP_PATTERNS, NLPMatcher
+
+
+def legacy_match(patterns, phrase):
+    for pattern, template in patterns.items():
+        match = re.match(pattern, phrase)
+        if match:
+            return template.format(*match.groups())
+    return None
+
+
+def synthetic_patterns(count):
+    patterns = dict(DEFAULT_NLP_PATTERNS)
+    for i in range(count - len(patterns)):
+        patterns[rf'verb{i} object (\S+) with (\S+)'] = f'cmd{i} {{0}} {{1}}'
+    return patterns
+
+
+def bench(label, patterns, phrases, iterations):
+    matcher = NLPMatcher(patterns)
+    for phrase in phrases:
+        assert matcher.match(phrase) == legacy_match(patterns, phrase), phrase
+
+    calls = iterations * len(phrases)
+    legacy = timeit.timeit(
+        lambda: [legacy_match(patterns, p) for p in phrases], number=iterations)
+    compiled = timeit.timeit(
+        lambda: [matcher.match(p) for p in phrases], number=iterations)
+    print(f"{label:<22} legacy {legacy / calls * 1e6:8.2f} us/call   "
+          f"matcher {compiled / calls * 1e6:6.2f} us/call   "
+          f"speedup {legacy / compiled:6.1f}x")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    phrases = [
+        'create file notes.txt',
+        'rename file a.txt to b.txt',
+        'list directory src',
+        'help',
+        'ls -la',                      # no match: falls through every pattern
+    ]
+    bench("15 built-in patterns", DEFAULT_NLP_PATTERNS, phrases, iterations)
+
+    big = synthetic_patterns(1000)
+    # 1,000 patterns overflow the re module's internal cache, so the legacy
+    # loop recompiles on every call; also hit one of the last patterns.
+    bench("1,000 patterns", big, phrases + ['verb984 object x with y'],
+          max(1, iterations // 20))
+
+
+if __name__ == "__main__":
+    main()
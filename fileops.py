@@ -0,0 +1,1099 @@
+#!/usr/bin/env python3
+"""
+File system engines behind the terminal's file built-ins:
+- Directory listings over os.scandir, using the DirEntry type cache and
+  stat-ing entries only when sizes or times are needed
+- Listings are produced lazily so huge directories stream instead of
+  being built up in memory first
+- Per-directory listing cache, valid while the directory's mtime is unchanged
+- Ranged file reads with pread (head/tail by lines, byte ranges) served in
+  capped pages, so large files never have to fit in memory
+- Copy engine: scandir tree walk, files copied on a thread pool with
+  kernel-side copying (copy_file_range, then sendfile) and holes preserved
+- Trash for recursive deletes: directories are renamed away instantly and
+  deleted on background threads walking with directory file descriptors
+- Content search: files read in line-aligned chunks on a process pool,
+  results yielded in file order as batches complete
+- find: scandir walk on a thread pool fed by a bounded directory queue
+- du: directory sizes from a parallel walk, with a persistent SQLite index
+  so unchanged directories are not rescanned
+"""
+
+import errno
+import fnmatch
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import stat
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import chain
+
+from singletons import singleton
+
+# Listing cache size, counted in directory entries across all cached directories
+LS_CACHE_MAX_ENTRIES = int(os.environ.get("TERMINAL_LS_CACHE_MAX_ENTRIES", 200_000))
+# Directories with fewer entries than this are cheap to rescan and not cached
+LS_CACHE_MIN_ENTRIES = int(os.environ.get("TERMINAL_LS_CACHE_MIN_ENTRIES", 256))
+
+# Most bytes `cat` returns in one response; the rest is paged with a token
+CAT_MAX_BYTES = int(os.environ.get("TERMINAL_CAT_MAX_BYTES", 1024 * 1024))
+
+# Threads copying files in parallel for `cp`
+COPY_WORKERS = int(os.environ.get("TERMINAL_COPY_WORKERS", 8))
+# Bytes per kernel copy call, and per read/write when the kernel can't copy
+_KERNEL_COPY_CHUNK = 64 * 1024 * 1024
+_BUFFERED_COPY_CHUNK = 1024 * 1024
+# Errors meaning "this copy method is unsupported here", so try the next one
+_COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+                         errno.ENOTSUP, errno.EBADF, errno.EPERM, errno.ETXTBSY}
+
+# Recursive deletes are renamed into this hidden directory next to the target
+TRASH_DIR_NAME = ".terminal_trash"
+TRASH_WORKERS = int(os.environ.get("TERMINAL_TRASH_WORKERS", 2))
+
+# grep: worker processes, the default cap on matches, and how files are batched
+# per task. Searches small enough to fit in one batch run in-process.
+GREP_WORKERS = int(os.environ.get("TERMINAL_GREP_WORKERS", os.cpu_count() or 1))
+GREP_MAX_RESULTS = int(os.environ.get("TERMINAL_GREP_MAX_RESULTS", 1000))
+_GREP_BATCH_FILES = 64
+_GREP_BATCH_BYTES = 8 * 1024 * 1024
+# A NUL byte in this many leading bytes marks a file as binary (as grep does)
+_GREP_BINARY_PROBE = 8192
+# Matched lines are cut to this many bytes (minified files are one long line)
+_GREP_MAX_LINE = 1000
+# Bytes read per step; chunks are cut at the last newline
+_GREP_CHUNK = 4 * 1024 * 1024
+
+# find: walker threads and the default cap on results. Directories that don't
+# fit in the shared queue are walked by the thread that found them.
+FIND_WORKERS = int(os.environ.get("TERMINAL_FIND_WORKERS", 8))
+FIND_MAX_RESULTS = int(os.environ.get("TERMINAL_FIND_MAX_RESULTS", 1000))
+_FIND_QUEUE_SIZE = 256
+
+# du: the directory size index and the threads walking trees for it
+DU_INDEX = os.environ.get("TERMINAL_DU_INDEX", os.path.join(os.getcwd(), "terminal_du.db"))
+DU_WORKERS = int(os.environ.get("TERMINAL_DU_WORKERS", 8))
+
+# Directory listing rows: (name, kind, size, mtime, mode). kind is one of
+# KINDS; size, mtime and mode are None unless the entries were stat-ed.
+KINDS = ("dir", "file", "symlink", "other")
+SORT_KEYS = ("name", "size", "mtime", "none")
+
+# A directory changed within this many seconds of its listing may change again
+# within the same mtime tick on coarse-timestamp file systems, so its listing
+# is not cached (the same trick git uses for "racily clean" index entries)
+_RACY_NS = 2 * 10**9
+
+
+def _kind(entry):
+    try:
+        if entry.is_symlink():
+            return "symlink"
+        if entry.is_dir(follow_symlinks=False):
+            return "dir"
+        if entry.is_file(follow_symlinks=False):
+            return "file"
+    except OSError:
+        pass
+    return "other"
+
+
+def scan_dir(path, with_stat=False):
+    """Yield listing rows for `path` in directory order.
+
+    File types come from the DirEntry (d_type on POSIX, no syscall); entries
+    are only lstat-ed when `with_stat` is set. Entries that vanish while
+    being scanned are skipped.
+    """
+    with os.scandir(path) as it:
+        for entry in it:
+            if not with_stat:
+                yield (entry.name, _kind(entry), None, None, None)
+                continue
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            yield (entry.name, _kind(entry), st.st_size, st.st_mtime, st.st_mode)
+
+
+class ListingCache:
+    """LRU cache of directory listings keyed by path.
+
+    An entry is reused only while the directory's (inode, mtime_ns) is
+    unchanged, i.e. no entry was added, removed or renamed. Sizes and times
+    of cached files are not revalidated: a file rewritten in place keeps its
+    cached metadata until something changes in its directory.
+    """
+
+    def __init__(self, max_entries=LS_CACHE_MAX_ENTRIES, min_entries=LS_CACHE_MIN_ENTRIES):
+        self.max_entries = max_entries
+        self.min_entries = min_entries
+        self._dirs = OrderedDict()      # path -> (inode, mtime_ns, with_stat, rows)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, st, with_stat):
+        with self._lock:
+            cached = self._dirs.get(path)
+            if (cached is None or cached[:2] != (st.st_ino, st.st_mtime_ns)
+                    or (with_stat and not cached[2])):
+                return None
+            self._dirs.move_to_end(path)
+            return cached[3]
+
+    def put(self, path, st, with_stat, rows):
+        if (len(rows) < self.min_entries or len(rows) > self.max_entries
+                or time.time_ns() - st.st_mtime_ns < _RACY_NS):
+            return
+        with self._lock:
+            old = self._dirs.pop(path, None)
+            if old is not None:
+                self._size -= len(old[3])
+            self._dirs[path] = (st.st_ino, st.st_mtime_ns, with_stat, rows)
+            self._size += len(rows)
+            while self._size > self.max_entries:
+                _, (_, _, _, evicted) = self._dirs.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._dirs.clear()
+            self._size = 0
+
+
+listing_cache = ListingCache()
+
+
+def _scan_streaming(path, st, with_stat, cache):
+    # Yield rows as they are scanned, caching them afterwards if they fit
+    rows = [] if cache is not None else None
+    for row in scan_dir(path, with_stat):
+        if rows is not None:
+            rows.append(row)
+            if len(rows) > cache.max_entries:
+                rows = None
+        yield row
+    if rows is not None:
+        cache.put(path, st, with_stat, tuple(sorted(rows)))
+
+
+def _list_one(path, with_stat, sort, cache):
+    """Rows of one directory, sorted; from the cache when still valid.
+
+    Listings are cached in name order, so the default sort is free on a hit
+    and the size/mtime sorts (stable) break ties by name.
+    """
+    st = os.stat(path)
+    rows = cache.get(path, st, with_stat) if cache is not None else None
+    if rows is None:
+        if sort == "none":
+            return _scan_streaming(path, st, with_stat, cache)
+        rows = tuple(sorted(scan_dir(path, with_stat)))
+        if cache is not None:
+            cache.put(path, st, with_stat, rows)
+    if sort == "size":
+        return sorted(rows, key=lambda row: -row[2])
+    if sort == "mtime":
+        return sorted(rows, key=lambda row: -row[3])
+    return rows
+
+
+def list_dir(path, show_all=False, long=False, recursive=False, sort="name", cache=listing_cache):
+    """Yield listing rows under `path`, names relative to it.
+
+    Each directory's entries come out together, followed by those of its
+    subdirectories in the same order (symlinked directories are not
+    followed). With sort="none" and no cached listing, rows are yielded as
+    scandir returns them rather than after the whole directory is read.
+    Unreadable subdirectories are skipped.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+    with_stat = long or sort in ("size", "mtime")
+    pending = [""]
+    while pending:
+        rel = pending.pop()
+        full = os.path.join(path, rel) if rel else path
+        try:
+            subdirs = []
+            for row in _list_one(full, with_stat, sort, cache):
+                name = row[0]
+                if not show_all and name.startswith("."):
+                    continue
+                if rel:
+                    name = os.path.join(rel, name)
+                    row = (name,) + row[1:]
+                yield row
+                if recursive and row[1] == "dir":
+                    subdirs.append(name)
+        except OSError:
+            if not rel:
+                raise
+            continue
+        pending.extend(reversed(subdirs))
+
+
+# Bytes read per step while counting lines for head/tail
+_LINE_CHUNK = 64 * 1024
+
+
+def _seek_read(f, count, offset):
+    # For Windows, which has no pread; callers own `f`, so seeking is safe
+    f.seek(offset)
+    return f.read(count)
+
+
+def _os_pread(f, count, offset):
+    return os.pread(f.fileno(), count, offset)
+
+
+_pread = _os_pread if hasattr(os, "pread") else _seek_read
+
+
+def _line_range(read, size, head, tail):
+    # read(offset, count) returns bytes; short reads (a file truncated while
+    # being scanned) just end the scan early
+    if size == 0 or head == 0:
+        return 0, 0
+    if tail == 0:
+        return size, size
+    remaining = head if head is not None else tail
+    if head is not None:
+        pos = 0
+        while pos < size:
+            block = read(pos, _LINE_CHUNK)
+            if not block:
+                break
+            i = -1
+            while remaining:
+                i = block.find(b"\n", i + 1)
+                if i < 0:
+                    break
+                remaining -= 1
+            if not remaining:
+                return 0, pos + i + 1
+            pos += len(block)
+        return 0, size
+    # A trailing newline ends the last line rather than starting another
+    pos = size - 1 if read(size - 1, 1) == b"\n" else size
+    while pos > 0:
+        low = max(0, pos - _LINE_CHUNK)
+        block = read(low, pos - low)
+        j = len(block)
+        while remaining:
+            j = block.rfind(b"\n", 0, j)
+            if j < 0:
+                break
+            remaining -= 1
+        if not remaining:
+            return low + j + 1, size
+        pos = low
+    return 0, size
+
+
+def line_range(path, head=None, tail=None):
+    """Byte range [start, end) of the first `head` or the last `tail` lines.
+
+    The file is scanned in chunks with pread (seek and read on Windows),
+    so tail never reads the start of the file. pread rather than mmap: touching a mapped page past
+    the end of a file truncated meanwhile (logrotate copytruncate) raises
+    SIGBUS, which would kill the server.
+    """
+    with open(path, 'rb') as f:
+        return _line_range(lambda offset, count: _pread(f, count, offset),
+                           os.fstat(f.fileno()).st_size, head, tail)
+
+
+def buffer_line_range(data, head=None, tail=None):
+    """line_range for bytes already in memory."""
+    return _line_range(lambda offset, count: data[offset:offset + count], len(data), head, tail)
+
+
+def parse_byte_range(spec, size):
+    """'A-B' (inclusive), 'A-' or '-N' (last N bytes) to a range [start, end)."""
+    first, sep, last = spec.partition("-")
+    if not sep or not (first or last) or not (first + last).isdigit():
+        raise ValueError(f"invalid byte range '{spec}'")
+    if not first:
+        return max(0, size - int(last)), size
+    start = min(int(first), size)
+    end = size if not last else min(int(last) + 1, size)
+    if end < start:
+        raise ValueError(f"invalid byte range '{spec}'")
+    return start, end
+
+
+def read_page(path, start, end, limit=CAT_MAX_BYTES):
+    """Read at most `limit` bytes of [start, end) from `path` with pread.
+
+    Returns (data, stop, size, inode): the page ends at `stop`, which is
+    moved back so a UTF-8 character is never split between pages. A file
+    truncated while being read gives a short page.
+    """
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        end = min(end, st.st_size)
+        start = min(start, end)
+        cut = min(end, start + max(0, limit)) - start
+        if cut == 0:
+            return b"", start, st.st_size, st.st_ino
+        # One byte more than the page shows whether it ends inside a character
+        data = _pread(f, cut + (start + cut < end), start)
+        if len(data) > cut:
+            # Back up over UTF-8 continuation bytes (at most 3)
+            for _ in range(3):
+                if cut - 1 <= 0 or data[cut] & 0xC0 != 0x80:
+                    break
+                cut -= 1
+        data = data[:cut]
+        return data, start + len(data), st.st_size, st.st_ino
+
+
+def read_unsized(path, limit=CAT_MAX_BYTES):
+    """Read up to `limit` bytes of a file that reports a size of 0.
+
+    Files in /proc, /sys and similar have content but no size, so they are
+    read sequentially rather than by range. Returns (data, truncated).
+    """
+    with open(path, 'rb') as f:
+        data = f.read(limit + 1)
+    return data[:limit], len(data) > limit
+
+
+def page_token(inode, offset, end):
+    """Continuation token for reading [offset, end) of the file with `inode`."""
+    return f"{inode:x}.{offset}.{end}"
+
+
+def parse_page_token(token):
+    try:
+        inode, offset, end = token.split(".")
+        return int(inode, 16), int(offset), int(end)
+    except ValueError:
+        raise ValueError(f"invalid continuation token '{token}'")
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _read_write(src_fd, dst_fd, offset, count):
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    data = os.read(src_fd, min(count, _BUFFERED_COPY_CHUNK))
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(dst_fd, view):]
+    return len(data)
+
+
+_COPY_METHODS = tuple(method for method, available in (
+    (_copy_file_range, hasattr(os, "copy_file_range")),
+    (_sendfile, hasattr(os, "sendfile") and os.name == "posix"),
+    (_read_write, True),
+) if available)
+
+
+def _copy_data(src_fd, dst_fd, offset, end):
+    """Copy bytes [offset, end) to the same offsets, as kernel-side as possible."""
+    methods = iter(_COPY_METHODS)
+    method = next(methods)
+    copied = 0
+    while offset < end:
+        try:
+            n = method(src_fd, dst_fd, offset, min(end - offset, _KERNEL_COPY_CHUNK))
+        except OSError as e:
+            if method is _read_write or e.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+            method = next(methods)
+            continue
+        if n == 0:      # the source shrank while being copied
+            break
+        offset += n
+        copied += n
+    return copied
+
+
+def _data_segments(fd, size):
+    """(start, end) of each non-hole region of a sparse file."""
+    pos = 0
+    while pos < size:
+        try:
+            start = os.lseek(fd, pos, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:      # only a hole is left
+                return
+            raise
+        pos = os.lseek(fd, start, os.SEEK_HOLE)
+        yield start, pos
+
+
+def copy_file(src, dst):
+    """Copy one file's data and metadata (like shutil.copy2); returns bytes copied.
+
+    Sparse files (fewer blocks allocated than their size needs) are copied
+    region by region with SEEK_DATA/SEEK_HOLE, leaving the holes unwritten.
+    Raises shutil.SameFileError when `dst` is `src` (opening it for writing
+    would truncate the source) and shutil.SpecialFileError for anything but
+    a regular file, since reading a FIFO or device may block forever.
+    """
+    if not stat.S_ISREG(os.stat(src).st_mode):
+        raise shutil.SpecialFileError(errno.EINVAL, "not a regular file", src)
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(errno.EINVAL, "source and destination are the same file", src)
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        st = os.fstat(src_fd)
+        if (hasattr(os, "SEEK_DATA") and hasattr(st, "st_blocks")
+                and st.st_blocks * 512 < st.st_size):
+            copied = sum(_copy_data(src_fd, dst_fd, start, end)
+                         for start, end in _data_segments(src_fd, st.st_size))
+            os.ftruncate(dst_fd, st.st_size)
+        else:
+            copied = _copy_data(src_fd, dst_fd, 0, st.st_size)
+    shutil.copystat(src, dst)
+    return copied
+
+
+def copy_tree(src, dst, workers=COPY_WORKERS):
+    """Copy the directory `src` to `dst`, copying files on `workers` threads.
+
+    Directories are created by the walking thread before any of their files
+    are queued; symlinks are recreated, not followed. Directory metadata is
+    copied last, deepest first, since adding files changes their mtimes.
+    Returns stats: files, dirs, symlinks, bytes and per-path errors.
+    """
+    stats = {"files": 0, "dirs": 0, "symlinks": 0, "bytes": 0, "errors": []}
+
+    def collect(futures):
+        for future in futures:
+            path = pending.pop(future)
+            try:
+                stats["bytes"] += future.result()
+                stats["files"] += 1
+            except OSError as e:
+                stats["errors"].append(f"{path}: {e.strerror or e}")
+
+    dirs = []
+    pending = {}        # future -> source path
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="copy") as pool:
+        stack = [(src, dst)]
+        while stack:
+            source, target = stack.pop()
+            try:
+                os.makedirs(target, exist_ok=True)
+                with os.scandir(source) as it:
+                    entries = list(it)
+            except OSError as e:
+                stats["errors"].append(f"{source}: {e.strerror or e}")
+                continue
+            dirs.append((source, target))
+            stats["dirs"] += 1
+            for entry in entries:
+                if entry.name == TRASH_DIR_NAME:
+                    continue
+                entry_target = os.path.join(target, entry.name)
+                try:
+                    if entry.is_symlink():
+                        os.symlink(os.readlink(entry.path), entry_target)
+                        stats["symlinks"] += 1
+                    elif entry.is_dir():
+                        stack.append((entry.path, entry_target))
+                    elif not entry.is_file():
+                        stats["errors"].append(f"{entry.path}: not a regular file")
+                    else:
+                        # Keep the queue short so huge trees don't pile up futures
+                        if len(pending) >= workers * 4:
+                            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            collect(done)
+                        pending[pool.submit(copy_file, entry.path, entry_target)] = entry.path
+                except OSError as e:
+                    stats["errors"].append(f"{entry.path}: {e.strerror or e}")
+        collect(list(wait(pending).done))
+    for source, target in reversed(dirs):
+        try:
+            shutil.copystat(source, target)
+        except OSError as e:
+            stats["errors"].append(f"{target}: {e.strerror or e}")
+    return stats
+
+
+class Trash:
+    """Recursive deletes that return as soon as the target is renamed away.
+
+    A directory is moved into a TRASH_DIR_NAME directory in its parent (a
+    rename on the same file system, so O(1)) and deleted by a thread pool.
+    Each worker first totals the tree's size, then deletes it bottom-up
+    with os.fwalk, unlinking by name relative to directory file descriptors
+    so no path is resolved twice. Leftovers from an earlier run are picked
+    up the next time something is trashed next to them.
+    """
+
+    def __init__(self, workers=TRASH_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="trash")
+        self._lock = threading.Lock()
+        self._pending = {}      # trashed path -> [bytes found, bytes deleted, still scanning]
+        self.deleted_items = 0
+        self.deleted_bytes = 0
+        self.errors = deque(maxlen=20)
+
+    def remove(self, path):
+        """Move directory `path` into the trash and queue it for deletion."""
+        parent, name = os.path.split(path.rstrip(os.sep))
+        trash_dir = os.path.join(parent, TRASH_DIR_NAME)
+        target = os.path.join(trash_dir, f"{uuid.uuid4().hex[:12]}-{name}")
+        with self._lock:
+            # Under the lock so a worker can't remove the trash dir in between
+            os.makedirs(trash_dir, exist_ok=True)
+            os.rename(path, target)
+            with os.scandir(trash_dir) as it:
+                stale = [entry.path for entry in it if entry.path not in self._pending]
+            for item in stale:
+                self._pending[item] = [0, 0, True]
+        for item in stale:
+            self._pool.submit(self._delete, item)
+        return target
+
+    def _delete(self, path):
+        progress = self._pending[path]
+        try:
+            if hasattr(os, "fwalk") and os.path.isdir(path) and not os.path.islink(path):
+                for _, _, filenames, dirfd in os.fwalk(path):
+                    for name in filenames:
+                        progress[0] += _lstat_size(name, dirfd)
+                progress[2] = False
+                for _, dirnames, filenames, dirfd in os.fwalk(path, topdown=False):
+                    for name in filenames:
+                        size = _lstat_size(name, dirfd)
+                        os.unlink(name, dir_fd=dirfd)
+                        progress[1] += size
+                    for name in dirnames:
+                        try:
+                            os.rmdir(name, dir_fd=dirfd)
+                        except NotADirectoryError:     # symlink to a directory
+                            os.unlink(name, dir_fd=dirfd)
+                os.rmdir(path)
+            elif os.path.isdir(path) and not os.path.islink(path):
+                progress[2] = False
+                shutil.rmtree(path)
+            else:
+                progress[2] = False
+                os.unlink(path)
+        except OSError as e:
+            self.errors.append(f"{path}: {e.strerror or e}")
+        with self._lock:
+            del self._pending[path]
+            self.deleted_items += 1
+            self.deleted_bytes += progress[1]
+            try:
+                os.rmdir(os.path.dirname(path))     # the trash dir, once empty
+            except OSError:
+                pass
+
+    def status(self):
+        with self._lock:
+            pending = list(self._pending.values())
+            return {
+                "pending": len(pending),
+                "pending_bytes": sum(found - deleted for found, deleted, _ in pending),
+                "scanning": sum(1 for *_, scanning in pending if scanning),
+                "deleted": self.deleted_items,
+                "deleted_bytes": self.deleted_bytes + sum(deleted for _, deleted, _ in pending),
+                "errors": list(self.errors),
+            }
+
+
+def _lstat_size(name, dirfd):
+    try:
+        return os.stat(name, dir_fd=dirfd, follow_symlinks=False).st_size
+    except FileNotFoundError:
+        return 0
+
+
+@singleton
+def get_trash():
+    return Trash()
+
+
+@lru_cache(maxsize=32)
+def grep_regex(pattern, ignore_case, fixed):
+    # Cached per process, so each worker compiles a pattern once
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    pattern = pattern.encode("utf-8")
+    return re.compile(re.escape(pattern) if fixed else pattern, flags)
+
+
+def _grep_chunk(regex, data, path, lineno, matches, max_matches, files_only):
+    # Search whole lines in `data`, whose first line is `lineno`; returns
+    # the number of the line following it
+    pos = counted = 0
+    size = len(data)
+    while pos <= size and len(matches) < max_matches:
+        match = regex.search(data, pos)
+        if match is None:
+            break
+        start = data.rfind(b"\n", 0, match.start()) + 1
+        end = data.find(b"\n", match.start())
+        if end == -1:
+            end = size
+        lineno += data.count(b"\n", counted, start)
+        counted = start
+        line = data[start:min(end, start + _GREP_MAX_LINE)]
+        matches.append((path, lineno, line.decode("utf-8", "replace").rstrip("\r")))
+        if files_only:
+            break
+        pos = end + 1
+    return lineno + data.count(b"\n", counted, size)
+
+
+def grep_file(regex, path, max_matches, files_only=False):
+    """(path, line number, line) for up to `max_matches` matching lines of `path`.
+
+    Binary files (a NUL near the start), empty and unreadable files give no
+    matches. Each line is reported once however many times it matches. The
+    file is read in chunks cut at line ends rather than mapped: a mapped
+    file truncated mid-search (logrotate copytruncate) raises SIGBUS.
+    """
+    matches = []
+    try:
+        with open(path, 'rb') as f:
+            buf = f.read(_GREP_CHUNK)
+            if b"\0" in buf[:_GREP_BINARY_PROBE]:
+                return matches
+            lineno = 1
+            while buf and len(matches) < max_matches and not (files_only and matches):
+                more = f.read(_GREP_CHUNK)
+                if more:
+                    cut = buf.rfind(b"\n") + 1
+                    if cut == 0:
+                        # A line longer than a chunk: read on to its end
+                        buf += more
+                        continue
+                    chunk, buf = buf[:cut], buf[cut:] + more
+                else:
+                    chunk, buf = buf, b""
+                lineno = _grep_chunk(regex, chunk, path, lineno, matches,
+                                     max_matches, files_only)
+    except (OSError, ValueError):
+        pass
+    return matches
+
+
+def grep_files(pattern, ignore_case, fixed, paths, max_matches, files_only=False):
+    """Process pool task: grep a batch of files, stopping at `max_matches`."""
+    regex = grep_regex(pattern, ignore_case, fixed)
+    matches = []
+    for path in paths:
+        matches.extend(grep_file(regex, path, max_matches - len(matches), files_only))
+        if len(matches) >= max_matches:
+            break
+    return matches
+
+
+def _grep_targets(paths, recursive):
+    # (path, size) of every regular file to search, in walk order
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, os.path.getsize(path)
+            continue
+        if not recursive:
+            continue
+        stack = [path]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != TRASH_DIR_NAME:
+                            subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path, entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+            stack.extend(reversed(subdirs))
+
+
+def _grep_batches(targets):
+    batch, size = [], 0
+    for path, file_size in targets:
+        batch.append(path)
+        size += file_size
+        if len(batch) >= _GREP_BATCH_FILES or size >= _GREP_BATCH_BYTES:
+            yield batch, size
+            batch, size = [], 0
+    if batch:
+        yield batch, size
+
+
+@singleton
+def get_grep_pool():
+    """Workers are spawned rather than forked: forking a multi-threaded server
+    can copy locks held by other threads into the child. Spawned workers
+    re-run the main script as __mp_main__, so a main script must keep its
+    server setup out of that path (app.py checks __name__).
+    """
+    return ProcessPoolExecutor(max_workers=GREP_WORKERS,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+def grep(pattern, paths, ignore_case=False, fixed=False, recursive=False,
+         max_matches=GREP_MAX_RESULTS, files_only=False):
+    """Yield (path, line number, line) for matches under `paths`, in walk order.
+
+    Files are handed to the process pool in batches; a few batches run
+    ahead of the one being yielded, so results stream out while the rest
+    of the tree is still being searched. Stops after `max_matches`.
+    """
+    batches = _grep_batches(_grep_targets(paths, recursive))
+    first = next(batches, None)
+    if first is None:
+        return
+    second = next(batches, None)
+    if second is None:
+        # One batch's worth of input: not worth a round trip to the pool
+        yield from grep_files(pattern, ignore_case, fixed, first[0], max_matches, files_only)
+        return
+
+    pool = get_grep_pool()
+    window = deque()
+    found = 0
+    try:
+        # None marks the end of the input: drain everything still running
+        for batch in chain((batch for batch, _ in chain([first, second], batches)), [None]):
+            if batch is not None:
+                window.append(pool.submit(grep_files, pattern, ignore_case, fixed, batch,
+                                          max_matches, files_only))
+            # Yield finished batches in order; block only once the window is full
+            while window and (batch is None or window[0].done()
+                              or len(window) > GREP_WORKERS * 2):
+                for match in window.popleft().result():
+                    yield match
+                    found += 1
+                    if found >= max_matches:
+                        return
+    except BrokenProcessPool:
+        _discard_grep_pool(pool)
+        raise
+    finally:
+        for future in window:
+            future.cancel()
+
+
+def _discard_grep_pool(pool):
+    # A worker died; start a fresh pool on the next search
+    get_grep_pool.discard(pool)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+_SIZE_UNITS = {"c": 1, "k": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def _compare(spec, value_of, unit=1):
+    # GNU find style numeric test: '+N' more than, '-N' less than, 'N' exactly
+    sign = spec[:1] if spec[:1] in "+-" else ""
+    number = int(spec[len(sign):])
+    if sign == "+":
+        return lambda st: value_of(st, unit) > number
+    if sign == "-":
+        return lambda st: value_of(st, unit) < number
+    return lambda st: value_of(st, unit) == number
+
+
+def find_predicate(name=None, iname=None, kind=None, size=None, mtime=None, now=None):
+    """Build a find test from GNU-style arguments.
+
+    `kind` is 'f', 'd' or 'l'; `size` is [+-]N with an optional c/k/M/G
+    suffix (bytes when there is none), rounded up to the unit like GNU
+    find; `mtime` is [+-]N whole days. Returns (test(name, kind, st),
+    needs_stat); `st` is only passed when needs_stat is true. Raises
+    ValueError on malformed arguments.
+    """
+    tests = []
+    if name is not None:
+        tests.append(lambda n, k, st: fnmatch.fnmatchcase(n, name))
+    if iname is not None:
+        folded = iname.casefold()
+        tests.append(lambda n, k, st: fnmatch.fnmatchcase(n.casefold(), folded))
+    if kind is not None:
+        kinds = {"f": "file", "d": "dir", "l": "symlink"}
+        if kind not in kinds:
+            raise ValueError(f"unknown type '{kind}' (use f, d or l)")
+        tests.append(lambda n, k, st: k == kinds[kind])
+    stat_tests = []
+    if size is not None:
+        unit = _SIZE_UNITS.get(size[-1:], None)
+        spec = size[:-1] if unit else size
+        if not spec.lstrip("+-").isdigit():
+            raise ValueError(f"invalid size '{size}'")
+        stat_tests.append(_compare(spec, lambda st, u: -(-st.st_size // u), unit or 1))
+    if mtime is not None:
+        if not mtime.lstrip("+-").isdigit():
+            raise ValueError(f"invalid mtime '{mtime}'")
+        now = time.time() if now is None else now
+        stat_tests.append(_compare(mtime, lambda st, u: int((now - st.st_mtime) // 86400)))
+
+    def test(n, k, st):
+        return (all(t(n, k, st) for t in tests)
+                and all(t(st) for t in stat_tests))
+
+    return test, bool(stat_tests)
+
+
+def _put(q, item, stop):
+    # Blocking put that gives up once the search is stopped
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def find(root, test, needs_stat=False, max_depth=None, workers=FIND_WORKERS):
+    """Yield paths under `root` (root included) that pass `test`.
+
+    Worker threads take directories from a bounded queue and scan them
+    with scandir. Subdirectories go back on the queue; when it is full the
+    worker walks them itself, so memory stays bounded without blocking.
+    Results are unordered and yielded as each directory is scanned.
+    Closing the generator stops the walk. Symlinks are not followed.
+    """
+    dirs = queue.Queue(maxsize=_FIND_QUEUE_SIZE)
+    out = queue.Queue(maxsize=_FIND_QUEUE_SIZE)
+    stop = threading.Event()
+    lock = threading.Lock()
+    outstanding = [1]       # directories queued or being walked
+
+    def scan(path, depth, local):
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return
+        matches = []
+        for entry in entries:
+            kind = _kind(entry)
+            try:
+                st = entry.stat(follow_symlinks=False) if needs_stat else None
+            except OSError:
+                continue
+            if test(entry.name, kind, st):
+                matches.append(entry.path)
+            if kind == "dir" and entry.name != TRASH_DIR_NAME and (
+                    max_depth is None or depth < max_depth):
+                with lock:
+                    outstanding[0] += 1
+                try:
+                    dirs.put_nowait((entry.path, depth + 1))
+                except queue.Full:
+                    local.append((entry.path, depth + 1))
+        if matches:
+            _put(out, matches, stop)
+
+    def work():
+        while not stop.is_set():
+            try:
+                item = dirs.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            local = [item]
+            while local and not stop.is_set():
+                try:
+                    scan(*local.pop(), local)
+                finally:
+                    with lock:
+                        outstanding[0] -= 1
+                        done = outstanding[0] == 0
+                    if done:
+                        _put(out, None, stop)
+                        for _ in range(workers):
+                            _put(dirs, None, stop)
+
+    st = os.lstat(root)
+    kind = ("dir" if stat.S_ISDIR(st.st_mode) else "symlink" if stat.S_ISLNK(st.st_mode)
+            else "file" if stat.S_ISREG(st.st_mode) else "other")
+    if test(os.path.basename(root.rstrip(os.sep)) or root, kind, st):
+        yield root
+    if kind != "dir" or max_depth == 0:
+        return
+    threads = [threading.Thread(target=work, name="find", daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    dirs.put((root, 1))
+    try:
+        while True:
+            batch = out.get()
+            if batch is None:
+                return
+            yield from batch
+    finally:
+        stop.set()
+
+
+def _disk_usage(st):
+    # Allocated bytes, as du reports; the apparent size where blocks are unknown
+    return st.st_blocks * 512 if hasattr(st, "st_blocks") else st.st_size
+
+
+def _scan_sizes(path):
+    """(bytes used by the files directly in `path`, names of its subdirectories)."""
+    own, subdirs = 0, []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                else:
+                    own += _disk_usage(entry.stat(follow_symlinks=False))
+            except OSError:
+                continue
+    return own, subdirs
+
+
+class SizeIndex:
+    """Persistent per-directory sizes for du.
+
+    For each directory the index keeps the bytes used by the files directly
+    in it and the names of its subdirectories, keyed by path and valid while
+    the directory's (device, inode, mtime_ns) is unchanged. A walk therefore
+    lstats every directory but only scandirs (and stats the files of) those
+    that changed. A directory's mtime only changes when entries are added,
+    removed or renamed, so a file growing in place is not noticed until its
+    directory changes; run `du --rescan` to rebuild the figures.
+    """
+
+    def __init__(self, db_path=DU_INDEX, workers=DU_WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY, dev INTEGER, ino INTEGER, mtime_ns INTEGER,
+                own_bytes INTEGER, subdirs TEXT);
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def _subtree(root):
+        # WHERE clause matching `root` and every path below it, as a range scan
+        prefix = root.rstrip(os.sep) + os.sep
+        return ("path = ? OR (path >= ? AND path < ?)",
+                (root, prefix, prefix[:-1] + chr(ord(os.sep) + 1)))
+
+    def _load(self, root):
+        where, params = self._subtree(root)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT path, dev, ino, mtime_ns, own_bytes, subdirs FROM dirs WHERE {where}",
+                params).fetchall()
+        return {path: ((dev, ino, mtime_ns), own, subdirs.split("\0") if subdirs else [])
+                for path, dev, ino, mtime_ns, own, subdirs in rows}
+
+    def _visit(self, path, cached, rescan):
+        st = os.lstat(path)
+        key = (st.st_dev, st.st_ino, st.st_mtime_ns)
+        hit = cached.get(path)
+        if (not rescan and hit is not None and hit[0] == key
+                and time.time_ns() - st.st_mtime_ns >= _RACY_NS):
+            return key, _disk_usage(st), hit[1], hit[2], False
+        own, subdirs = _scan_sizes(path)
+        return key, _disk_usage(st), own, subdirs, True
+
+    def usage(self, root, depth=1, rescan=False):
+        """Total bytes under `root` and the directories up to `depth` below it.
+
+        The tree is walked a level at a time, each level's directories
+        visited in parallel. Changed directories are written back to the
+        index and subtrees that disappeared are dropped from it. An
+        unreadable `root` raises OSError; unreadable directories below it are
+        left out of the totals and listed under "errors", like GNU du.
+        """
+        start = time.perf_counter()
+        st = os.lstat(root)
+        if not stat.S_ISDIR(st.st_mode):
+            return {"path": root, "total": _disk_usage(st), "entries": [], "dirs": 0,
+                    "rescanned": 0, "errors": [], "seconds": time.perf_counter() - start}
+        cached = {} if rescan else self._load(root)
+        order = []          # (path, depth, own bytes incl. the directory, child paths)
+        changed, removed, errors = [], [], []
+        level, frontier = 0, [root]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="du") as pool:
+            while frontier:
+                futures = [pool.submit(self._visit, path, cached, rescan) for path in frontier]
+                next_frontier = []
+                for path, future in zip(frontier, futures):
+                    try:
+                        key, dir_bytes, own, subdirs, fresh = future.result()
+                    except OSError as e:
+                        if path == root:
+                            raise
+                        errors.append({"path": path, "error": e.strerror or str(e)})
+                        continue
+                    children = [os.path.join(path, name) for name in subdirs]
+                    order.append((path, level, own + dir_bytes, children))
+                    next_frontier.extend(children)
+                    if fresh:
+                        changed.append((path, *key, own, "\0".join(subdirs)))
+                        if path in cached:
+                            gone = set(cached[path][2]) - set(subdirs)
+                            removed.extend(os.path.join(path, name) for name in gone)
+                frontier = next_frontier
+                level += 1
+
+        totals = {}
+        for path, _, own, children in reversed(order):
+            totals[path] = own + sum(totals.get(child, 0) for child in children)
+        self._store(root if rescan else None, changed, removed)
+        entries = sorted(({"path": path, "bytes": totals[path]}
+                          for path, level, _, _ in order[1:] if level <= depth),
+                         key=lambda entry: -entry["bytes"])
+        return {"path": root, "total": totals[root], "entries": entries, "dirs": len(order),
+                "rescanned": len(changed), "errors": errors,
+                "seconds": time.perf_counter() - start}
+
+    def _store(self, reset_root, changed, removed):
+        with self._lock:
+            with self._db:
+                if reset_root is not None:
+                    where, params = self._subtree(reset_root)
+                    self._db.execute(f"DELETE FROM dirs WHERE {where}", params)
+                for path in removed:
+                    where, params = self._subtree(path)
+                    self._db.execute(f"DELETE FROM dirs WHERE {where}", params)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO dirs (path, dev, ino, mtime_ns, own_bytes, subdirs) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", changed)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+@singleton
+def get_size_index():
+    return SizeIndex()
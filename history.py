@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Command history storage for the Unified Python Terminal:
+- Background writer that batches history appends instead of
+  opening/writing/closing the file on every command
+- Configurable durability: fsync per command, fsync per batch, or none
+- Tail reader that loads only the last N entries of the history file
+- SQLite index over the history file for term, prefix and time-range search
+- Size/age based rotation into (optionally gzipped, deduplicated) segments
+"""
+
+import atexit
+import gzip
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from datetime import datetime
+
+from prometheus import HISTORY_WRITE_DURATION
+
+# fsync: write and fsync every entry before returning (safest, slowest)
+# batch: queue entries, write and fsync them in batches from a thread
+# none:  queue entries, write them in batches, leave syncing to the OS
+DURABILITY_MODES = ("fsync", "batch", "none")
+
+_live_writers = weakref.WeakSet()
+
+# history prefix sorts at most this many index matches; beyond it, it walks ids
+_PREFIX_SORT_MAX = 1000
+
+
+class HistoryWriter:
+    def __init__(self, path, durability="batch", batch_size=64, flush_interval=1.0,
+                 on_flush=None, rotator=None, on_rotate=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {', '.join(DURABILITY_MODES)}")
+        self.path = path
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.rotator = rotator
+        # Called with the new file size whenever the file is replaced
+        self.on_rotate = on_rotate
+        self._pending = []
+        self._file = None
+        self._closed = False
+        self._io_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._thread = None
+        if durability != "fsync":
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+        _live_writers.add(self)
+
+    def write(self, entry):
+        if self.durability == "fsync":
+            self._write_batch([entry])
+            return
+        with self._cond:
+            closed = self._closed
+            if not closed:
+                self._pending.append(entry)
+                if len(self._pending) >= self.batch_size:
+                    self._cond.notify()
+        if closed:
+            self._write_batch([entry])
+
+    def flush(self):
+        self._write_batch(None)
+
+    def clear(self):
+        """Drop queued entries, truncate the history file and its segments."""
+        with self._cond:
+            self._pending = []
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            open(self.path, 'w').close()
+            for segment in history_segments(self.path):
+                os.remove(segment)
+
+    def compact(self):
+        """Drop consecutive duplicate commands from the current history file."""
+        self.flush()
+        with self._io_lock:
+            self._release_file()
+            if not os.path.exists(self.path):
+                return 0
+            tmp = self.path + ".compact"
+            with open(self.path, 'r', errors='replace') as src, open(tmp, 'w') as dst:
+                removed = copy_entries(src, dst, dedupe=True)
+            os.replace(tmp, self.path)
+            if self.on_rotate is not None:
+                self.on_rotate(os.path.getsize(self.path))
+        return removed
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---------------- Internals ----------------
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def _write_batch(self, batch):
+        # batch=None writes the pending queue. It is taken while holding
+        # _io_lock so concurrent flushes cannot reorder batches in the file.
+        with self._io_lock:
+            if batch is None:
+                with self._cond:
+                    batch, self._pending = self._pending, []
+                if not batch:
+                    return
+            data = "".join(entry + "\n" for entry in batch)
+            start = time.perf_counter()
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a')
+                self._file.write(data)
+                self._file.flush()
+                if self.durability != "none":
+                    os.fsync(self._file.fileno())
+            except Exception as e:
+                print(f"Error saving history: {e}")
+                return
+            HISTORY_WRITE_DURATION.observe(time.perf_counter() - start)
+        if self.on_flush is not None:
+            self.on_flush()
+        if self.rotator is not None:
+            self._maybe_rotate()
+
+    def _release_file(self):
+        # Called with _io_lock held: make sure everything written is indexed
+        # before the file is renamed or rewritten underneath the index.
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.on_flush is not None:
+            self.on_flush()
+
+    def _maybe_rotate(self):
+        with self._io_lock:
+            if not self.rotator.due(self.path):
+                return
+            self._release_file()
+            # Renaming is O(1); compressing the detached file happens unlocked
+            detached = self.rotator.detach(self.path)
+            if self.on_rotate is not None:
+                self.on_rotate(0)
+        try:
+            self.rotator.archive(self.path, detached)
+        except Exception as e:
+            print(f"Error rotating history: {e}")
+
+
+def copy_entries(src, dst, dedupe=False):
+    """Copy history lines from `src` to `dst`, returning how many were dropped.
+
+    With `dedupe`, a line whose command repeats the previous line's command
+    is dropped; only the first timestamp of a run is kept.
+    """
+    previous = None
+    dropped = 0
+    for line in src:
+        if dedupe:
+            command = parse_entry(line.rstrip("\n"))[1]
+            if command == previous:
+                dropped += 1
+                continue
+            previous = command
+        dst.write(line)
+    return dropped
+
+
+class HistoryRotator:
+    """Move the history file aside into timestamped segments.
+
+    Segments are named '<name>.<YYYYmmdd-HHMMSS>.txt[.gz]' next to the live
+    file and only the newest `keep` are retained.
+    """
+
+    def __init__(self, max_bytes=1024 * 1024, max_age=None, compress=True,
+                 compact=True, keep=20):
+        self.max_bytes = max_bytes
+        self.max_age = max_age      # seconds since the file's first entry
+        self.compress = compress
+        self.compact = compact
+        self.keep = keep
+        self._started = {}          # path -> timestamp of its first entry
+
+    def due(self, path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        if size == 0:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        if self.max_age:
+            return time.time() - self._first_entry_time(path) >= self.max_age
+        return False
+
+    def _first_entry_time(self, path):
+        if path not in self._started:
+            with open(path, 'r', errors='replace') as f:
+                ts = parse_entry(f.readline().strip())[0]
+            try:
+                self._started[path] = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S").timestamp()
+            except ValueError:
+                self._started[path] = os.path.getmtime(path)
+        return self._started[path]
+
+    def detach(self, path):
+        self._started.pop(path, None)
+        base = os.path.splitext(path)[0]
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        segment = f"{base}.{stamp}.txt"
+        n = 1
+        while os.path.exists(segment) or os.path.exists(segment + ".gz"):
+            segment = f"{base}.{stamp}-{n}.txt"
+            n += 1
+        os.rename(path, segment)
+        return segment
+
+    def archive(self, path, segment):
+        if self.compact or self.compress:
+            target = segment + ".gz" if self.compress else segment
+            tmp = target + ".tmp"
+            opener = gzip.open if self.compress else open
+            with open(segment, 'r', errors='replace') as src, opener(tmp, 'wt') as dst:
+                copy_entries(src, dst, dedupe=self.compact)
+            os.replace(tmp, target)
+            if target != segment:
+                os.remove(segment)
+        if self.keep:
+            for old in history_segments(path)[:-self.keep]:
+                os.remove(old)
+
+
+_SEGMENT_RE = re.compile(r'\.(\d{8}-\d{6})(?:-(\d+))?\.txt(?:\.gz)?')
+
+
+def history_segments(path):
+    """Rotated segments of the history file at `path`, oldest first."""
+    directory, name = os.path.split(os.path.abspath(path))
+    base = os.path.splitext(name)[0]
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    segments = []
+    for n in names:
+        match = n.startswith(base) and _SEGMENT_RE.fullmatch(n[len(base):])
+        if match:
+            segments.append(((match.group(1), int(match.group(2) or 0)), n))
+    return [os.path.join(directory, n) for _, n in sorted(segments)]
+
+
+def open_segment(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', errors='replace')
+    return open(path, 'r', errors='replace')
+
+
+_ENTRY_RE = re.compile(r'\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\] (.*)')
+
+
+def parse_entry(line):
+    """Split a '[timestamp] command' history line into (timestamp, command)."""
+    match = _ENTRY_RE.match(line)
+    if match:
+        return match.group(1), match.group(2)
+    return "", line
+
+
+def read_tail(path, count, block_size=8192):
+    """Return the last `count` lines of `path` without reading the whole file."""
+    if count <= 0:
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        pos = end
+        data = b""
+        # One extra newline is needed to know the first kept line is complete
+        while pos > 0 and data.count(b"\n") <= count:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    if pos > 0:
+        lines = lines[1:]
+    return [line.strip() for line in lines[-count:]]
+
+
+class HistoryIndex:
+    """SQLite index kept in step with the history text file.
+
+    The text file stays the source of truth: `sync()` indexes whatever was
+    appended since the last recorded byte offset, so the index can be deleted
+    and rebuilt at any time.
+    """
+
+    def __init__(self, db_path, history_path):
+        self.db_path = db_path
+        self.history_path = history_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY, ts TEXT NOT NULL, command TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS history_ts ON history(ts);
+            CREATE INDEX IF NOT EXISTS history_command ON history(command);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+        """)
+        try:
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING "
+                "fts5(command, content='history', content_rowid='id')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: term search falls back to LIKE
+            self.fts = False
+        self._db.commit()
+
+    # ---------------- Indexing ----------------
+    def _get_offset(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'offset'").fetchone()
+        return row[0] if row else None
+
+    def _set_offset(self, offset):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('offset', ?)", (offset,))
+
+    def sync(self):
+        """Index complete lines appended to the history file since the last sync."""
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                size = os.path.getsize(self.history_path)
+            except OSError:
+                return
+            offset = self._get_offset()
+            if offset is None:
+                # Fresh index: pick up rotated segments before the live file
+                self._index_segments()
+                offset = 0
+            if size < offset:
+                # File was truncated or replaced; keep old rows, index the new file
+                offset = 0
+            if size == offset:
+                return
+            with open(self.history_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+            complete = data.rfind(b"\n") + 1
+            if complete == 0:
+                return
+            lines = data[:complete].decode('utf-8', errors='replace').splitlines()
+            with self._db:
+                self._insert(lines)
+                self._set_offset(offset + complete)
+
+    def _index_segments(self):
+        for segment in history_segments(self.history_path):
+            try:
+                with open_segment(segment) as f, self._db:
+                    self._insert(f)
+            except (OSError, EOFError) as e:
+                print(f"Error indexing {segment}: {e}")
+
+    def _insert(self, lines):
+        cursor = self._db.cursor()
+        for line in lines:
+            ts, command = parse_entry(line.strip())
+            cursor.execute("INSERT INTO history (ts, command) VALUES (?, ?)", (ts, command))
+            if self.fts:
+                cursor.execute("INSERT INTO history_fts (rowid, command) VALUES (?, ?)",
+                               (cursor.lastrowid, command))
+
+    def reset(self, offset):
+        """Record that the history file was replaced and is indexed up to `offset`."""
+        with self._lock, self._db:
+            self._set_offset(offset)
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM history")
+            if self.fts:
+                self._db.execute("INSERT INTO history_fts (history_fts) VALUES ('delete-all')")
+            self._set_offset(0)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------------- Queries ----------------
+    def _query(self, where, params, limit, order="id DESC"):
+        self.sync()
+        sql = f"SELECT ts, command FROM history WHERE {where} ORDER BY {order} LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(sql, (*params, limit)).fetchall()
+        return rows[::-1]
+
+    def search(self, term, limit=50):
+        """Entries containing the words of `term`, at most `limit` of the newest."""
+        if self.fts:
+            quoted = '"' + term.replace('"', '""') + '"'
+            return self._query(
+                "id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ? "
+                "ORDER BY rowid DESC LIMIT ?)", (quoted, limit), limit)
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return self._query("command LIKE ? ESCAPE '\\'", (f"%{escaped}%",), limit)
+
+    def prefix(self, prefix, limit=50):
+        """Entries starting with `prefix`, at most `limit` of the newest.
+
+        Read through the command index, every match is sorted by id before
+        LIMIT applies, which is slow for a common prefix ('ls', 'git') over
+        millions of entries. So the index is only used to count matches up
+        to _PREFIX_SORT_MAX: fewer than that are cheap to sort, and with more
+        SQLite walks ids newest first instead and stops after `limit`.
+        """
+        bounds = (prefix, prefix + "\U0010ffff")
+        self.sync()
+        with self._lock:
+            matches = self._db.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM history "
+                "WHERE command >= ? AND command < ? LIMIT ?)",
+                (*bounds, _PREFIX_SORT_MAX)).fetchone()[0]
+        if matches < _PREFIX_SORT_MAX:
+            return self._query("command >= ? AND command < ?", bounds, limit)
+        # The unary + keeps SQLite off the command index, so it scans by id
+        return self._query("+command >= ? AND +command < ?", bounds, limit)
+
+    def time_range(self, since, until=None, limit=50):
+        """Entries with since <= timestamp, and timestamp within `until` if given.
+
+        Bounds are 'YYYY-MM-DD[ HH:MM[:SS]]' prefixes; `until` is inclusive of
+        everything it is a prefix of, so until='2025-09-21' covers the whole day.
+        """
+        # Ordering on ts lets SQLite walk the ts index and stop after `limit`
+        if until is None:
+            return self._query("ts >= ?", (since,), limit, order="ts DESC")
+        return self._query("ts >= ? AND ts <= ?", (since, until + "\uffff"), limit,
+                           order="ts DESC")
+
+
+@atexit.register
+def _flush_all_writers():
+    for writer in list(_live_writers):
+        writer.close()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Asynchronous command jobs for the Flask server:
+- Commands run on a bounded thread pool; callers get a job id immediately
+- Job status/result lookups and cancellation (queued jobs are dropped,
+  running system commands have their process group killed)
+- Only the most recent finished jobs are kept
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from terminal import kill_process, set_spawn_hook
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class Job:
+    def __init__(self, terminal, command, owner=None, format="text"):
+        self.id = uuid.uuid4().hex
+        self.terminal = terminal
+        self.command = command
+        self.owner = owner
+        self.format = format
+        self.status = QUEUED
+        self.output = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._process = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def attach_process(self, proc):
+        with self._lock:
+            self._process = proc
+            cancelled = self.status == CANCELLED
+        if cancelled:
+            kill_process(proc)
+
+    def run(self):
+        with self._lock:
+            if self.status == CANCELLED:
+                return
+            self.status = RUNNING
+            self.started_at = time.time()
+        set_spawn_hook(self.attach_process)
+        try:
+            result = self.terminal.run_command(self.command)
+            if result is None:
+                output, status, error = None, DONE, None
+            elif not result.ok:
+                output, status, error = None, FAILED, result.error
+            else:
+                output = result.data if self.format == "json" else result.text()
+                status, error = DONE, None
+        except Exception as e:
+            output, status, error = None, FAILED, str(e)
+        finally:
+            set_spawn_hook(None)
+        with self._lock:
+            if self.status != CANCELLED:
+                self.status, self.output, self.error = status, output, error
+            self.finished_at = time.time()
+            self._process = None
+
+    def cancel(self):
+        with self._lock:
+            if self.finished:
+                return False
+            self.status = CANCELLED
+            proc = self._process
+            if self.started_at is None:
+                self.finished_at = time.time()
+        if self.future is not None:
+            self.future.cancel()
+        if proc is not None:
+            kill_process(proc)
+        return True
+
+    def to_dict(self):
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.id,
+                "command": self.command,
+                "status": self.status,
+                "output": self.output,
+                "error": self.error,
+                "submitted_at": self.submitted_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "duration": end - self.started_at if self.started_at else None,
+            }
+
+
+class JobManager:
+    def __init__(self, max_workers=8, max_finished=1000):
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()      # job id -> Job, oldest first
+        self._lock = threading.Lock()
+
+    def submit(self, terminal, command, owner=None, format="text"):
+        job = Job(terminal, command, owner, format)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._pool.submit(job.run)
+        return job
+
+    def get(self, job_id, owner=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def cancel(self, job_id, owner=None):
+        job = self.get(job_id, owner)
+        return job is not None and job.cancel()
+
+    def _prune(self):
+        # Called with _lock held: drop the oldest finished jobs over the limit
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+System monitoring helpers for the Unified Python Terminal:
+- Background CPU sampler so `cpu` answers from the latest snapshot instead
+  of blocking for a full sampling interval
+- Cached process table refreshed in the background by diffing PID sets
+- Top-N process selection with bounded heaps instead of full sorts
+- Host metrics recorded into fixed-size array('f') ring buffers
+"""
+
+import heapq
+import math
+import os
+import threading
+import time
+from array import array
+from collections import deque
+
+from singletons import singleton
+
+# For system monitoring
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+CPU_SAMPLE_INTERVAL = float(os.environ.get("TERMINAL_CPU_SAMPLE_INTERVAL", 1.0))
+PROCESS_REFRESH_INTERVAL = float(os.environ.get("TERMINAL_PROCESS_REFRESH_INTERVAL", 2.0))
+METRICS_RESOLUTION = float(os.environ.get("TERMINAL_METRICS_RESOLUTION", 1.0))
+METRICS_RETENTION = float(os.environ.get("TERMINAL_METRICS_RETENTION", 3600))
+
+
+class CPUSampler:
+    """Samples per-core CPU usage every `interval` seconds on a daemon thread.
+
+    The last `window` seconds of samples are kept in a ring so rolling
+    averages can be computed without touching psutil.
+    """
+
+    def __init__(self, interval=CPU_SAMPLE_INTERVAL, window=15):
+        self.interval = interval
+        self._samples = deque(maxlen=max(1, math.ceil(window / interval)))
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cpu-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # The first call only sets the baseline psutil measures against
+        psutil.cpu_percent(interval=None, percpu=True)
+        while not self._stop.wait(self.interval):
+            usage = psutil.cpu_percent(interval=None, percpu=True)
+            self._samples.append((time.monotonic(), usage))
+            self._ready.set()
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self, timeout=None):
+        """Most recent per-core percentages; waits for the first sample."""
+        if not self._ready.wait(self.interval * 2 if timeout is None else timeout):
+            return None
+        return self._samples[-1][1]
+
+    def average(self, seconds):
+        """Mean usage across all cores over the last `seconds`."""
+        cutoff = time.monotonic() - seconds - self.interval / 2
+        recent = [sum(usage) / len(usage) for ts, usage in list(self._samples)
+                  if ts >= cutoff and usage]
+        if not recent:
+            return None
+        return sum(recent) / len(recent)
+
+
+@singleton
+def get_cpu_sampler():
+    return CPUSampler()
+
+
+class ProcessTable:
+    """Process list kept up to date on a daemon thread.
+
+    Each refresh diffs the current PID set against the cached one: only new
+    PIDs get a psutil.Process (and their name/username looked up), exited
+    PIDs are dropped, and the rest just have CPU and memory usage updated.
+    Queries read the last published snapshot and never scan /proc.
+    """
+
+    SORT_KEYS = {"pid": 0, "cpu": 3, "mem": 4, "rss": 5}
+
+    def __init__(self, interval=PROCESS_REFRESH_INTERVAL):
+        self.interval = interval
+        self._procs = {}        # pid -> psutil.Process, owned by the refresh thread
+        self._info = {}         # pid -> (name, username)
+        self._rows = {}         # published snapshot: pid -> (pid, name, user, cpu, mem, rss)
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="process-table", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing process table: {e}")
+            self._ready.set()
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self):
+        pids = set(psutil.pids())
+        for pid in self._procs.keys() - pids:
+            del self._procs[pid]
+            self._info.pop(pid, None)
+        for pid in pids - self._procs.keys():
+            try:
+                proc = psutil.Process(pid)
+                with proc.oneshot():
+                    self._info[pid] = (proc.name(), _safe(proc.username, None))
+                    proc.cpu_percent(None)      # baseline for the next refresh
+            except psutil.Error:
+                continue
+            self._procs[pid] = proc
+
+        rows = {}
+        for pid, proc in list(self._procs.items()):
+            try:
+                with proc.oneshot():
+                    cpu = proc.cpu_percent(None)
+                    # memory_info is cached by oneshot and reused by memory_percent
+                    rss = _safe(lambda: proc.memory_info().rss, 0)
+                    mem = _safe(proc.memory_percent, 0.0)
+            except psutil.NoSuchProcess:
+                del self._procs[pid]
+                self._info.pop(pid, None)
+                continue
+            except psutil.Error:
+                cpu, mem, rss = 0.0, 0.0, 0
+            name, username = self._info[pid]
+            rows[pid] = (pid, name, username, cpu, mem, rss)
+        self._rows = rows
+
+    def rows(self, sort="pid", top=50):
+        """The first `top` rows ordered by `sort` (pid ascending, else descending).
+
+        Selection uses a bounded heap, O(P log N) rather than sorting all P rows.
+        """
+        self._ready.wait()
+        key = self.SORT_KEYS[sort]
+        rows = self._rows.values()
+        if sort == "pid":
+            return heapq.nsmallest(top, rows, key=lambda row: row[0])
+        return heapq.nlargest(top, rows, key=lambda row: row[key])
+
+
+def top_processes_by_io(top=50):
+    """(pid, name, username, read+write bytes) of the `top` busiest processes.
+
+    I/O counters are not cached by ProcessTable, so this scans once, asking
+    psutil for only the attributes it needs.
+    """
+    def entries():
+        for proc in psutil.process_iter(['name', 'username', 'io_counters']):
+            io = proc.info['io_counters']
+            if io is not None:
+                yield (proc.pid, proc.info['name'], proc.info['username'],
+                       io.read_bytes + io.write_bytes)
+
+    return heapq.nlargest(top, entries(), key=lambda row: row[3])
+
+
+def _safe(getter, default):
+    try:
+        return getter()
+    except psutil.AccessDenied:
+        return default
+
+
+@singleton
+def get_process_table():
+    return ProcessTable()
+
+
+class SeriesRing:
+    """Fixed-capacity ring of float32 samples backed by one array('f')."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = array('f', bytes(4 * capacity))
+        self._count = 0         # total samples ever appended
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def append(self, value):
+        self._data[self._count % self.capacity] = value
+        self._count += 1
+
+    def downsample(self, count, points):
+        """Average the newest `count` samples into at most `points` buckets.
+
+        Returns (bucket size in samples, list of bucket means), oldest first.
+        """
+        count = min(count, len(self))
+        if count <= 0 or points <= 0:
+            return 1, []
+        size = -(-count // points)      # ceil division
+        data, capacity = self._data, self.capacity
+        start = self._count - count
+        buckets = []
+        for first in range(start, self._count, size):
+            last = min(first + size, self._count)
+            total = 0.0
+            for i in range(first, last):
+                total += data[i % capacity]
+            buckets.append(total / (last - first))
+        return size, buckets
+
+    def summary(self, count):
+        """(last, min, mean, max) of the newest `count` samples, or None."""
+        count = min(count, len(self))
+        if count <= 0:
+            return None
+        data, capacity = self._data, self.capacity
+        low, high, total = float("inf"), float("-inf"), 0.0
+        for i in range(self._count - count, self._count):
+            value = data[i % capacity]
+            total += value
+            low = min(low, value)
+            high = max(high, value)
+        return data[(self._count - 1) % capacity], low, total / count, high
+
+
+class MetricsRecorder:
+    """Samples host metrics every `resolution` seconds into SeriesRings.
+
+    All series share one clock: sample i of every series was taken at the
+    same tick, so timestamps are implied by `last_time` and `resolution`.
+    Rates (bytes/s) are computed from counter deltas between ticks.
+    """
+
+    SERIES = {
+        "cpu": "%", "mem": "%", "swap": "%", "disk": "%",
+        "disk_read": "B/s", "disk_write": "B/s", "net_sent": "B/s", "net_recv": "B/s",
+    }
+
+    def __init__(self, resolution=METRICS_RESOLUTION, retention=METRICS_RETENTION,
+                 disk_path=os.path.abspath(os.sep)):
+        self.resolution = resolution
+        self.disk_path = disk_path
+        capacity = max(1, int(retention / resolution))
+        self.series = {name: SeriesRing(capacity) for name in self.SERIES}
+        self.started_at = time.time()
+        self.last_time = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-recorder", daemon=True)
+        self._thread.start()
+
+    def _counters(self):
+        disk = psutil.disk_io_counters()
+        net = psutil.net_io_counters()
+        return (disk.read_bytes if disk else 0, disk.write_bytes if disk else 0,
+                net.bytes_sent if net else 0, net.bytes_recv if net else 0)
+
+    def _run(self):
+        psutil.cpu_percent(interval=None)
+        previous, previous_time = self._counters(), time.monotonic()
+        while not self._stop.wait(self.resolution):
+            try:
+                counters, now = self._counters(), time.monotonic()
+                elapsed = max(now - previous_time, 1e-6)
+                rates = [(c - p) / elapsed for c, p in zip(counters, previous)]
+                previous, previous_time = counters, now
+                values = (psutil.cpu_percent(interval=None),
+                          psutil.virtual_memory().percent,
+                          psutil.swap_memory().percent,
+                          psutil.disk_usage(self.disk_path).percent,
+                          *rates)
+            except Exception as e:
+                print(f"Error recording metrics: {e}")
+                continue
+            with self._lock:
+                for ring, value in zip(self.series.values(), values):
+                    ring.append(value)
+                self.last_time = time.time()
+
+    def stop(self):
+        self._stop.set()
+
+    def _names(self, names):
+        names = list(names or self.SERIES)
+        unknown = [n for n in names if n not in self.SERIES]
+        if unknown:
+            raise ValueError(f"unknown series: {', '.join(unknown)}")
+        return names
+
+    def query(self, since, points=120, names=None):
+        """Downsampled series covering the last `since` seconds."""
+        names = self._names(names)
+        count = int(since / self.resolution)
+        with self._lock:
+            result = {}
+            step = self.resolution
+            for name in names:
+                size, values = self.series[name].downsample(count, points)
+                step = size * self.resolution
+                result[name] = values
+            return {
+                "resolution": self.resolution,
+                "step": step,
+                "end": self.last_time,
+                "units": {name: self.SERIES[name] for name in names},
+                "series": result,
+            }
+
+    def summary(self, since, names=None):
+        """name -> (last, min, mean, max) over the last `since` seconds."""
+        names = self._names(names)
+        count = int(since / self.resolution)
+        with self._lock:
+            return {name: self.series[name].summary(count) for name in names}
+
+
+@singleton
+def get_metrics_recorder():
+    return MetricsRecorder()
+
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text):
+    """'90', '90s', '5m', '2h' or '1d' to seconds; ValueError unless finite and > 0."""
+    text = text.strip().lower()
+    unit = _DURATION_UNITS.get(text[-1:], None)
+    number = text[:-1] if unit else text
+    try:
+        seconds = float(number) * (unit or 1)
+    except ValueError:
+        seconds = None
+    if seconds is None or not 0 < seconds < math.inf:
+        raise ValueError(f"invalid duration '{text}'")
+    return seconds
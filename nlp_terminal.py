@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+NLP command parsing for the Unified Python Terminal:
+- All phrase patterns are compiled once into combined alternations
+- Patterns are routed by their literal first word, so a phrase is resolved
+  with one dict lookup and one regex match however many patterns exist
+- First registered pattern wins, exactly like the old sequential re.match loop
+- Patterns that can't share an alternation (named groups, backreferences,
+  global inline flags) are matched on their own, still in registration order
+"""
+
+import re
+import threading
+
+DEFAULT_NLP_PATTERNS = {
+    r'create file (\S+)': 'touch {0}',
+    r'create folder (\S+)': 'mkdir {0}',
+    r'delete file (\S+)': 'rm {0}',
+    r'remove file (\S+)': 'rm {0}',
+    r'rename file (\S+) to (\S+)': 'mv {0} {1}',
+    r'move (\S+) to (\S+)': 'mv {0} {1}',
+    r'copy (\S+) to (\S+)': 'cp {0} {1}',
+    r'show contents of (\S+)': 'cat {0}',
+    r'list directory (\S+)': 'ls {0}',
+    r'go to directory (\S+)': 'cd {0}',
+    r'current directory': 'pwd',
+    r'clear screen': 'clear',
+    r'exit': 'exit',
+    r'quit': 'quit',
+    r'help': 'help'
+}
+
+# Characters that may appear in a literal leading keyword of a pattern. The
+# space after it must be required: in 'make ?dir' it is optional, so the
+# pattern also matches 'makedir' and can't be routed under 'make'.
+_KEYWORD_RE = re.compile(r'[a-z0-9_\-]+(?= (?![?*{]))')
+
+
+def _scan(pattern):
+    """Return (has top-level '|', needs isolation) for `pattern`.
+
+    A pattern needs isolation when embedding it in a combined alternation
+    would change or break it: backreferences (group numbers shift) and
+    conditionals on a group, and global inline flags such as '(?i)' (only
+    allowed at the very start of a regex).
+    """
+    alternation = isolate = False
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            if pattern[i + 1:i + 2].isdigit() and pattern[i + 1] != "0":
+                isolate = True
+            i += 2
+            continue
+        if in_class:
+            if c == "]":
+                in_class = False
+        elif c == "[":
+            in_class = True
+            # A ']' right after '[' or '[^' is a literal
+            if pattern[i + 1:i + 2] == "^":
+                i += 1
+            if pattern[i + 1:i + 2] == "]":
+                i += 1
+        elif c == "(":
+            depth += 1
+            if pattern.startswith(("(?P=", "(?("), i) or re.match(r"\(\?[aiLmsux]+\)", pattern[i:]):
+                isolate = True
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            alternation = True
+        i += 1
+    return alternation, isolate
+
+
+def _leading_keyword(pattern):
+    """Return the literal first word of `pattern`, or None if it has none.
+
+    A pattern is only routable when its first word is plain text followed by
+    a literal, required space and it has no top-level '|' (whose other
+    branches may start with any word); anything else (e.g. 'exit', which also
+    prefix-matches 'exiting') goes to the wildcard bucket that is tried for
+    every phrase.
+    """
+    match = _KEYWORD_RE.match(pattern)
+    if match is None or _scan(pattern)[0]:
+        return None
+    return match.group(0)
+
+
+class NLPMatcher:
+    def __init__(self, patterns=None):
+        self._entries = []      # (pattern, template, group count, isolated regex)
+        # (keyword -> segments, wildcard-only segments), where segments are
+        # (regex, slots) pairs tried in order; swapped in as one tuple so
+        # concurrent readers never see a mix
+        self._compiled = ({}, [])
+        # Bumped on every change; the tables are rebuilt while _built lags
+        self._version = 0
+        self._built = -1
+        self._lock = threading.Lock()
+        for pattern, template in (patterns or {}).items():
+            self.add(pattern, template)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, pattern, template):
+        """Register `pattern`; raises re.error if it is not a valid regex."""
+        regex = re.compile(pattern)
+        # Named groups could clash with other patterns' groups once combined
+        isolated = regex if regex.groupindex or _scan(pattern)[1] else None
+        self._entries.append((pattern, template, regex.groups, isolated))
+        self._version += 1
+
+    def remove(self, pattern):
+        self._entries = [e for e in self._entries if e[0] != pattern]
+        self._version += 1
+
+    # ---------------- Compilation ----------------
+    @staticmethod
+    def _combine(entries, indices):
+        parts = []
+        slots = {}
+        group = 1
+        for i in indices:
+            pattern, template, groups, _ = entries[i]
+            name = f"_p{i}"
+            parts.append(f"(?P<{name}>{pattern})")
+            slots[name] = (template, group + 1, group + 1 + groups)
+            group += groups + 1
+        return re.compile("|".join(parts)), slots
+
+    def _compile_bucket(self, entries, indices):
+        # Runs of combinable patterns become one alternation each; isolated
+        # patterns sit between them as their own segment (slots is then the
+        # template), so registration order is kept across segments
+        segments = []
+        run = []
+        for i in indices:
+            isolated = entries[i][3]
+            if isolated is None:
+                run.append(i)
+                continue
+            if run:
+                segments.append(self._combine(entries, run))
+                run = []
+            segments.append((isolated, entries[i][1]))
+        if run:
+            segments.append(self._combine(entries, run))
+        return segments
+
+    def _build(self):
+        # The version is read before the entries, so a pattern added
+        # mid-build triggers another build. If compiling fails, the last good
+        # tables stay in place and the next match retries (and re-raises).
+        version = self._version
+        entries = list(self._entries)
+        keyed = {}
+        wildcard = []
+        for i, (pattern, *_) in enumerate(entries):
+            keyword = _leading_keyword(pattern)
+            if keyword is None:
+                wildcard.append(i)
+            else:
+                keyed.setdefault(keyword, []).append(i)
+
+        # Wildcard patterns are merged into every bucket in registration
+        # order so the earliest matching pattern still wins.
+        routes = {
+            keyword: self._compile_bucket(entries, sorted(indices + wildcard))
+            for keyword, indices in keyed.items()
+        }
+        fallback = self._compile_bucket(entries, wildcard)
+        self._compiled = (routes, fallback)
+        self._built = version
+
+    # ---------------- Matching ----------------
+    def match(self, phrase):
+        """Translate `phrase` to a command, or return None if nothing matches."""
+        if self._built != self._version:
+            with self._lock:
+                if self._built != self._version:
+                    self._build()
+        routes, fallback = self._compiled
+        for regex, slots in routes.get(phrase.split(" ", 1)[0], fallback):
+            match = regex.match(phrase)
+            if match is None:
+                continue
+            if isinstance(slots, str):
+                return slots.format(*match.groups())
+            template, start, end = slots[match.lastgroup]
+            return template.format(*match.groups()[start - 1:end - 1])
+        return None
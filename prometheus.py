@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Prometheus text-format metrics for the terminal server:
+- Counters, gauges and histograms with optional labels
+- Histogram buckets live in fixed arrays, so observing is a bisect plus an
+  increment and scraping never allocates per-observation objects
+"""
+
+import threading
+from array import array
+from bisect import bisect_left
+
+# Latency buckets in seconds, from sub-millisecond built-ins to slow subprocesses
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        return tuple(str(v) for v in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Gauge whose value is read from `callback()` at scrape time.
+
+    The callback returns a number, or a dict of label-value tuple -> number.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, help, callback, labels=()):
+        super().__init__(name, help, labels)
+        self.callback = callback
+
+    def _samples(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in value.items()]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.bounds = tuple(sorted(buckets))
+        self._series = {}       # label values -> (bucket counts incl. +Inf, [sum])
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = bisect_left(self.bounds, value)     # le semantics: value <= bound
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = (array('Q', bytes(8 * (len(self.bounds) + 1))),
+                                              array('d', [0.0]))
+            counts, total = series
+            counts[index] += 1
+            total[0] += value
+
+    def _samples(self):
+        with self._lock:
+            snapshot = [(k, array('Q', c), t[0]) for k, (c, t) in self._series.items()]
+        lines = []
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            labels = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, callback, labels=()):
+        return self.register(Gauge(name, help, callback, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Metrics recorded by the terminal itself; the server adds its own
+COMMAND_DURATION = REGISTRY.histogram(
+    "terminal_command_duration_seconds", "Time spent in UnifiedTerminal.execute per command",
+    labels=("command",))
+SUBPROCESS_SPAWNS = REGISTRY.counter(
+    "terminal_subprocess_spawns_total", "Processes started by system commands")
+SUBPROCESS_DURATION = REGISTRY.histogram(
+    "terminal_subprocess_duration_seconds", "Lifetime of processes started by system commands")
+HISTORY_WRITE_DURATION = REGISTRY.histogram(
+    "terminal_history_write_seconds", "Time to write (and sync) one history batch")
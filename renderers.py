@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Text rendering for built-in command results:
+- Built-ins return plain data (strings, lists, dicts) that JSON clients get as-is
+- These functions turn that data into the terminal's human-readable output and
+  only run when text output is requested
+"""
+
+from datetime import datetime
+
+
+def render_default(data):
+    if data is None:
+        return ""
+    if isinstance(data, str):
+        return data
+    if isinstance(data, (list, tuple)):
+        return "\n".join(render_default(item) for item in data)
+    if isinstance(data, dict):
+        return "\n".join(f"{key}: {render_default(value)}" for key, value in data.items())
+    return str(data)
+
+
+def format_bytes(value):
+    for suffix in ("B", "KB", "MB", "GB"):
+        if abs(value) < 1024:
+            return f"{value:.1f} {suffix}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def format_metric(value, unit):
+    if unit == "%":
+        return f"{value:.1f}%"
+    return format_bytes(value) + "/s"
+
+
+# ---------------- File commands ----------------
+def render_ls(entries):
+    if not entries:
+        return "(empty)"
+    if isinstance(entries[0], str):
+        return "\n".join(entries)
+    # Most entries share a minute with another one; format each minute once
+    minutes = {}
+    lines = []
+    for e in entries:
+        minute = int(e['mtime'] // 60)
+        stamp = minutes.get(minute)
+        if stamp is None:
+            stamp = minutes[minute] = datetime.fromtimestamp(minute * 60).strftime('%Y-%m-%d %H:%M')
+        lines.append(f"{e['mode']} {e['size']:>12} {stamp} {e['name']}")
+    return "\n".join(lines)
+
+
+def render_cd(data):
+    return f"Changed directory to '{data['cwd']}'"
+
+
+def render_mkdir(paths):
+    return "\n".join(f"Directory '{path}' created successfully" for path in paths)
+
+
+def _render_removed(kind, r):
+    if r.get('trashed'):
+        return f"Directory '{r['path']}' moved to trash, deleting in the background"
+    return f"{kind} '{r['path']}' removed successfully"
+
+
+def render_rmdir(results):
+    return "\n".join(
+        _render_removed("Directory", r) if r['removed'] else f"rmdir: '{r['path']}' {r['error']}"
+        for r in results)
+
+
+def render_rm(results):
+    return "\n".join(
+        _render_removed("File", r) if r['removed'] else f"rm: '{r['path']}' {r['error']}"
+        for r in results)
+
+
+def render_trash(data):
+    lines = [f"Pending: {data['pending']} items, {format_bytes(data['pending_bytes'])}"
+             + (f" ({data['scanning']} still being measured)" if data['scanning'] else ""),
+             f"Deleted: {data['deleted']} items, {format_bytes(data['deleted_bytes'])}"]
+    lines.extend(f"trash: {error}" for error in data['errors'])
+    return "\n".join(lines)
+
+
+def render_touch(paths):
+    return "\n".join(f"File '{path}' created successfully" for path in paths)
+
+
+def render_mv(data):
+    return f"'{data['source']}' renamed/moved to '{data['destination']}' successfully"
+
+
+def render_cp(data):
+    kind = "Directory" if data['type'] == "directory" else "File"
+    outcome = f"with {len(data['errors'])} errors" if data['errors'] else "successfully"
+    lines = [f"{kind} '{data['source']}' copied to '{data['destination']}' {outcome}"]
+    lines.extend(f"cp: {error}" for error in data['errors'])
+    lines.append(f"{data['files']} files, {format_bytes(data['bytes'])} in {data['seconds']:.2f}s "
+                 f"({format_bytes(data['bytes_per_sec'])}/s, {data['files_per_sec']:.0f} files/s)")
+    return "\n".join(lines)
+
+
+def render_cat(results):
+    parts = []
+    for r in results:
+        if 'error' in r:
+            parts.append(f"cat: '{r['path']}' {r['error']}")
+            continue
+        parts.append(r['content'])
+        if r.get('truncated'):
+            parts.append(f"[truncated at {r['end']} bytes]")
+        elif r.get('next'):
+            parts.append(f"[truncated at byte {r['end']} of {r['size']}; "
+                         f"continue with: cat --continue {r['next']} {r['path']}]")
+    return "\n".join(parts)
+
+
+def render_grep(matches):
+    lines = []
+    for m in matches:
+        if m.get('truncated'):
+            lines.append(f"[stopped after {m['limit']} matches; raise the cap with --max N]")
+        elif 'line' in m:
+            lines.append(f"{m['path']}:{m['line']}:{m['text']}")
+        else:
+            lines.append(m['path'])
+    return "\n".join(lines)
+
+
+def render_find(paths):
+    return "\n".join(
+        f"[stopped after {p['limit']} results; raise the cap with --max-results N]"
+        if isinstance(p, dict) else p
+        for p in paths)
+
+
+def render_du(results):
+    lines = []
+    for r in results:
+        lines.extend(f"du: cannot read directory '{e['path']}': {e['error']}"
+                     for e in r['errors'])
+        lines.extend(f"{format_bytes(e['bytes']):>10}  {e['path']}" for e in r['entries'])
+        line = f"{format_bytes(r['total']):>10}  {r['path']}"
+        if r['dirs']:
+            line += (f"  ({r['rescanned']} of {r['dirs']} directories scanned, "
+                     f"{r['seconds']:.2f}s)")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def render_echo(data):
+    if isinstance(data, str):
+        return data
+    action = "appended to" if data['mode'] == "append" else "written to"
+    return f"Text {action} '{data['file']}' successfully"
+
+
+def render_history(data):
+    if data.get('cleared'):
+        return "History cleared"
+    if 'removed' in data:
+        return f"History compacted, {data['removed']} repeated entries removed"
+    entries = data['entries']
+    if not entries and data.get('query'):
+        return f"history {data['query']}: no matches"
+    return "\n".join(f"[{e['timestamp']}] {e['command']}" if e['timestamp'] else e['command']
+                     for e in entries)
+
+
+# ---------------- System monitoring ----------------
+def render_cpu(data):
+    lines = [f"CPU {i}: {u}%" for i, u in enumerate(data['cores'])]
+    lines.append("Average 1s/5s/15s: " + " / ".join(
+        "n/a" if avg is None else f"{avg:.1f}%" for avg in data['average'].values()))
+    return "\n".join(lines)
+
+
+def render_memory(data):
+    return (f"Total: {data['total'] // 1024**2} MB\n"
+            f"Used: {data['used'] // 1024**2} MB\n"
+            f"Free: {data['available'] // 1024**2} MB\n"
+            f"Percentage: {data['percent']}%")
+
+
+def render_processes(rows):
+    lines = []
+    for row in rows:
+        head = f"{row['pid']:>5} {(row['name'] or '')[:20]:<20} {row['username']}"
+        if 'io_bytes' in row:
+            lines.append(f"{head} {row['io_bytes'] / 1024**2:10.1f} MB")
+        else:
+            lines.append(f"{head} {row['cpu_percent']:5.1f}% {row['memory_percent']:5.1f}% "
+                         f"{row['rss'] / 1024**2:8.1f} MB")
+    return "\n".join(lines)
+
+
+def render_stats(data):
+    lines = [f"{'series':<11} {'last':>12} {'min':>12} {'avg':>12} {'max':>12}"]
+    for name, s in data['series'].items():
+        lines.append(f"{name:<11} " + " ".join(
+            f"{format_metric(s[k], s['unit']):>12}" for k in ("last", "min", "avg", "max")))
+    return "\n".join(lines)
+
+
+# ---------------- System commands ----------------
+def render_system(data):
+    output = data['stdout'].strip()
+    if data['stderr']:
+        output += "\n" + data['stderr'].strip()
+    return output
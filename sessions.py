@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Per-client terminal sessions for the Flask server:
+- One UnifiedTerminal per session id, each with its own history shard
+- Bounded number of live sessions with LRU eviction of idle ones; sessions
+  held by a request, job or stream are never evicted
+- History of one-shot sessions (clients without a cookie jar) is deleted on
+  eviction instead of piling up
+"""
+
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from history import history_segments
+from terminal import CommandStats, UnifiedTerminal
+
+HISTORY_DIR = os.path.join(os.getcwd(), "history")
+
+# Session ids are generated by new_session_id(); anything else is rejected so
+# an id can be used as a file name safely.
+_SESSION_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def valid_session_id(session_id):
+    return bool(session_id) and _SESSION_ID_RE.fullmatch(session_id) is not None
+
+
+class Session:
+    def __init__(self, terminal, one_shot):
+        self.terminal = terminal
+        self.last_used = 0.0
+        # Requests, jobs and streams currently holding the terminal
+        self.users = 0
+        # Created for a client that sent no cookie and hasn't come back with one
+        self.one_shot = one_shot
+
+
+class SessionManager:
+    def __init__(self, history_dir=HISTORY_DIR, max_sessions=64, idle_timeout=30 * 60):
+        self.history_dir = history_dir
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        # Shared by every session so /stats survives evictions
+        self.command_stats = CommandStats()
+        self._sessions = OrderedDict()     # session id -> Session, least recently used first
+        self._lock = threading.Lock()
+        os.makedirs(history_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def history_file(self, session_id):
+        return os.path.join(self.history_dir, f"{session_id}.txt")
+
+    def acquire(self, session_id, returning=True):
+        """Return the Session for `session_id`, creating it if needed, and hold it.
+
+        A held session is never evicted; hand it back with release(). Pass
+        returning=False for an id just minted for a client without a cookie:
+        until the client comes back with it, the session is one-shot and its
+        history files are deleted when it is evicted.
+        """
+        if not valid_session_id(session_id):
+            raise ValueError(f"invalid session id: {session_id!r}")
+        now = time.monotonic()
+        with self._lock:
+            session, evicted = self._hold(session_id, None, returning, now)
+        if session is None:
+            # Opening a terminal's history takes milliseconds, so it is done
+            # without the lock; if another request created the session
+            # meanwhile, that one is used and this terminal is closed
+            terminal = UnifiedTerminal(history_file=self.history_file(session_id),
+                                       command_stats=self.command_stats)
+            with self._lock:
+                session, evicted = self._hold(session_id, Session(terminal, one_shot=not returning),
+                                              returning, now)
+            if session.terminal is not terminal:
+                terminal.close()
+        for old in evicted:
+            self._discard(old)
+        return session
+
+    def _hold(self, session_id, created, returning, now):
+        # Called with _lock held: take the session for `session_id`, adding
+        # `created` if there is none yet. Returns (None, []) when there is
+        # neither, else the held session and the sessions evicted for it.
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            if created is None:
+                return None, []
+            session = created
+        elif returning:
+            session.one_shot = False
+        session.last_used = now
+        session.users += 1
+        self._sessions[session_id] = session
+        return session, self._evict(now)
+
+    def release(self, session):
+        with self._lock:
+            session.users -= 1
+
+    @contextmanager
+    def use(self, session_id, returning=True):
+        """Hold the terminal for `session_id` for the duration of a with block."""
+        session = self.acquire(session_id, returning)
+        try:
+            yield session.terminal
+        finally:
+            self.release(session)
+
+    def _evict(self, now):
+        # Called with _lock held; oldest entries are at the front. Sessions
+        # still in use are skipped and evicted on a later call.
+        evicted = []
+        for session_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions and now - session.last_used < self.idle_timeout:
+                break
+            if session.users:
+                continue
+            del self._sessions[session_id]
+            evicted.append(session)
+        return evicted
+
+    def _discard(self, session):
+        terminal = session.terminal
+        terminal.close()
+        if not session.one_shot:
+            return
+        # Nobody can come back to a one-shot session, so drop its history shard
+        db_path = terminal.history_index.db_path
+        for path in [terminal.history_file, *history_segments(terminal.history_file),
+                     db_path, db_path + "-wal", db_path + "-shm"]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            self._discard(session)
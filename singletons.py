@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Process-wide objects created on first use (samplers, worker pools, indexes):
+- @singleton turns a factory into a getter that builds the object once,
+  even when several threads make the first call at the same time
+- getter.discard(obj) forgets a broken instance so the next call rebuilds it
+"""
+
+import functools
+import threading
+
+
+def singleton(factory):
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    def discard(obj):
+        with lock:
+            if instance and instance[0] is obj:
+                instance.clear()
+
+    get.discard = discard
+    return get
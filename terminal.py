@@ -8,11 +8,38 @@ Unified Python Terminal:
 - Added confirmation messages for file/folder operations
 """
 
+import codecs
+import glob
 import os
-import subprocess
 import re
+import shlex
+import signal
+import stat
+import subprocess
+import threading
+import time
+from collections import deque
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
+from types import GeneratorType
+
+from fileops import (CAT_MAX_BYTES, FIND_MAX_RESULTS, GREP_MAX_RESULTS, TRASH_DIR_NAME,
+                     buffer_line_range, copy_file, copy_tree, find, find_predicate, get_size_index, get_trash,
+                     grep, grep_regex,
+                     line_range, list_dir, page_token, parse_byte_range, parse_page_token,
+                     read_page, read_unsized)
+
+from history import HistoryIndex, HistoryRotator, HistoryWriter, parse_entry, read_tail
+from monitoring import (get_cpu_sampler, get_metrics_recorder, get_process_table,
+                        parse_duration, top_processes_by_io)
+from nlp_terminal import DEFAULT_NLP_PATTERNS, NLPMatcher
+from prometheus import COMMAND_DURATION, SUBPROCESS_DURATION, SUBPROCESS_SPAWNS
+from renderers import (render_cat, render_cd, render_cp, render_cpu, render_default,
+                       render_echo, render_history, render_ls, render_memory, render_mkdir,
+                       render_mv, render_processes, render_rm, render_rmdir, render_stats,
+                       render_system, render_touch, render_trash, render_grep,
+                       render_find, render_du)
 
 try:
     import readline
@@ -28,6 +55,31 @@ except ImportError:
     PSUTIL_AVAILABLE = False
 
 HISTORY_FILE = os.path.join(os.getcwd(), "terminal_history.txt")
+# fsync | batch | none, see history.DURABILITY_MODES
+HISTORY_DURABILITY = os.environ.get("TERMINAL_HISTORY_DURABILITY", "batch")
+# Number of entries kept in memory; older ones stay in the history file only
+HISTORY_LIMIT = int(os.environ.get("TERMINAL_HISTORY_LIMIT", 1000))
+# Rotate the history file once it reaches this size or its first entry this age
+HISTORY_MAX_BYTES = int(os.environ.get("TERMINAL_HISTORY_MAX_BYTES", 1024 * 1024))
+HISTORY_MAX_AGE_DAYS = float(os.environ.get("TERMINAL_HISTORY_MAX_AGE_DAYS", 0))
+HISTORY_COMPRESS = os.environ.get("TERMINAL_HISTORY_COMPRESS", "1") == "1"
+HISTORY_KEEP = int(os.environ.get("TERMINAL_HISTORY_KEEP", 20))
+# Seconds a system command may run before it is killed
+COMMAND_TIMEOUT = float(os.environ.get("TERMINAL_COMMAND_TIMEOUT", 30))
+
+# Streaming output: bytes read per chunk and the most the server will hold for
+# one command before the child process is made to wait (backpressure)
+STREAM_CHUNK_SIZE = int(os.environ.get("TERMINAL_STREAM_CHUNK_SIZE", 4096))
+STREAM_MAX_BUFFERED = int(os.environ.get("TERMINAL_STREAM_MAX_BUFFERED", 256 * 1024))
+# Built-ins that produce their results lazily are rendered this many items at a time
+STREAM_BATCH_ITEMS = int(os.environ.get("TERMINAL_STREAM_BATCH_ITEMS", 256))
+
+# Per-thread hook called with every process system_command starts, so the
+# async job runner can kill a command's process when its job is cancelled
+_spawn_hooks = threading.local()
+
+def set_spawn_hook(hook):
+    _spawn_hooks.hook = hook
 
 def safe_print(*args, **kwargs):
     try:
@@ -35,230 +87,759 @@ def safe_print(*args, **kwargs):
     except Exception as e:
         print(f"Print error: {e}")
 
-class UnifiedTerminal:
+def kill_process(proc):
+    """Kill `proc` and, on POSIX, every process in its process group."""
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            proc.kill()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+class OutputBuffer:
+    """Bounded byte queue between a pipe reader thread and a consumer.
+
+    `put` blocks while more than `max_bytes` are buffered, which stops the
+    reader from draining the pipe and so eventually blocks the child process.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._chunks = deque()
+        self._size = 0
+        self._eof = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, chunk):
+        with self._cond:
+            while self._size >= self.max_bytes and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return False
+            self._chunks.append(chunk)
+            self._size += len(chunk)
+            self._cond.notify_all()
+            return True
+
+    def finish(self):
+        with self._cond:
+            self._eof = True
+            self._cond.notify_all()
+
+    def close(self):
+        """Consumer is gone: unblock and stop the reader."""
+        with self._cond:
+            self._closed = True
+            self._chunks.clear()
+            self._size = 0
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Next chunk, b"" on timeout, or None once the producer has finished."""
+        with self._cond:
+            if not self._chunks and not self._eof:
+                self._cond.wait(timeout)
+            if self._chunks:
+                chunk = self._chunks.popleft()
+                self._size -= len(chunk)
+                self._cond.notify_all()
+                return chunk
+            return None if self._eof else b""
+
+# Built-in commands: command name -> UnifiedTerminal method name
+BUILTINS = {}
+# Command name -> function turning the handler's result into text
+RENDERERS = {}
+
+def builtin(*names, render=None):
+    """Register the decorated method as the handler for `names`.
+
+    Handlers take the argument list and return their result as plain data
+    (str, list, dict, or a generator of list items for long outputs);
+    `render` turns that data into text when text output is requested.
+    Handlers raise CommandError for usage and lookup errors.
+    """
+    def decorator(func):
+        for name in names:
+            BUILTINS[name] = func.__name__
+            if render is not None:
+                RENDERERS[name] = render
+        return func
+    return decorator
+
+# Built-ins whose arguments are split like a shell would (quotes group words
+# and are removed); lines using pipes, redirection or lists run in the shell
+SHELL_WORD_BUILTINS = {"grep", "find", "du"}
+_SHELL_OPERATOR_CHARS = set("();<>|&")
+
+def split_shell_words(command):
+    """Split `command` into words, or return None if it needs a real shell.
+
+    An unquoted |, <, >, ;, &, ( or ) means the line uses shell syntax (pipes,
+    redirection, command lists), as does an unbalanced quote.
+    """
+    lexer = shlex.shlex(command, posix=False, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        tokens = list(lexer)
+    except ValueError:
+        return None
+    if any(set(token) <= _SHELL_OPERATOR_CHARS for token in tokens):
+        return None
+    if os.name == "nt":
+        # POSIX rules would treat the backslashes in Windows paths as escapes
+        return [t[1:-1] if len(t) > 1 and t[0] == t[-1] and t[0] in "'\"" else t
+                for t in tokens]
+    return shlex.split(command)
+
+class CommandError(Exception):
+    """A command failed; the message is shown to the user as-is."""
+
+class CommandResult:
+    def __init__(self, name, data=None, error=None, render=render_default):
+        self.name = name
+        self.data = data
+        self.error = error
+        self.render = render
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def text(self):
+        return self.error if self.error is not None else self.render(self.data)
+
+    def to_json(self):
+        if self.error is not None:
+            return {"output": None, "error": self.error}
+        return {"output": self.data}
+
+def _history_entry(timestamp, command):
+    return {"timestamp": timestamp, "command": command}
+
+class CommandStats:
+    """Per-command call counts and cumulative latency, shareable across terminals."""
+
     def __init__(self):
-        self.history = []
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, elapsed):
+        with self._lock:
+            calls, total = self._stats.get(name, (0, 0.0))
+            self._stats[name] = (calls + 1, total + elapsed)
+        COMMAND_DURATION.observe(elapsed, name)
+
+    def snapshot(self):
+        with self._lock:
+            items = list(self._stats.items())
+        return {
+            name: {"calls": calls, "total_seconds": total,
+                   "avg_seconds": total / calls if calls else 0.0}
+            for name, (calls, total) in items
+        }
+
+class UnifiedTerminal:
+    def __init__(self, history_file=HISTORY_FILE, history_durability=HISTORY_DURABILITY,
+                 history_limit=HISTORY_LIMIT, command_stats=None, cwd=None):
+        # Working directory of this terminal; the process cwd is never changed
+        self.cwd = os.path.abspath(cwd or os.getcwd())
+        self.history_file = history_file
+        self.history = deque(maxlen=history_limit)
+        # Guards self.history and keeps file order identical to memory order
+        self._history_lock = threading.Lock()
+        self.history_index = HistoryIndex(os.path.splitext(history_file)[0] + ".db", history_file)
+        rotator = HistoryRotator(max_bytes=HISTORY_MAX_BYTES,
+                                 max_age=HISTORY_MAX_AGE_DAYS * 86400,
+                                 compress=HISTORY_COMPRESS, keep=HISTORY_KEEP)
+        self.history_writer = HistoryWriter(history_file, durability=history_durability,
+                                            on_flush=self.history_index.sync,
+                                            rotator=rotator,
+                                            on_rotate=self.history_index.reset)
+        self.commands = {name: getattr(self, attr) for name, attr in BUILTINS.items()}
+        self.renderers = dict(RENDERERS)
+        self.command_stats = command_stats if command_stats is not None else CommandStats()
         self.load_history()
-        if READLINE_AVAILABLE:
-            readline.parse_and_bind("tab: complete")
-            readline.set_completer(self.completer)
 
         # NLP patterns
-        self.nlp_patterns = {
-            r'create file (\S+)': 'touch {0}',
-            r'create folder (\S+)': 'mkdir {0}',
-            r'delete file (\S+)': 'rm {0}',
-            r'remove file (\S+)': 'rm {0}',
-            r'rename file (\S+) to (\S+)': 'mv {0} {1}',
-            r'move (\S+) to (\S+)': 'mv {0} {1}',
-            r'copy (\S+) to (\S+)': 'cp {0} {1}',
-            r'show contents of (\S+)': 'cat {0}',
-            r'list directory (\S+)': 'ls {0}',
-            r'go to directory (\S+)': 'cd {0}',
-            r'current directory': 'pwd',
-            r'clear screen': 'clear',
-            r'exit': 'exit',
-            r'quit': 'quit',
-            r'help': 'help'
-        }
+        self.nlp_patterns = dict(DEFAULT_NLP_PATTERNS)
+        self.nlp_matcher = NLPMatcher(self.nlp_patterns)
 
     # ---------------- History ----------------
     def load_history(self):
-        if os.path.exists(HISTORY_FILE):
+        if os.path.exists(self.history_file):
             try:
-                with open(HISTORY_FILE, 'r') as f:
-                    self.history = [line.strip() for line in f.readlines()]
+                self.history.extend(read_tail(self.history_file, self.history.maxlen))
             except Exception as e:
                 safe_print(f"Error loading history: {e}")
 
     def save_history(self, command):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         entry = f"[{timestamp}] {command}"
-        self.history.append(entry)
-        try:
-            with open(HISTORY_FILE, 'a') as f:
-                f.write(entry + "\n")
-        except Exception as e:
-            safe_print(f"Error saving history: {e}")
+        with self._history_lock:
+            self.history.append(entry)
+            self.history_writer.write(entry)
+
+    def close(self):
+        self.history_writer.close()
+        self.history_index.close()
 
     # ---------------- NLP Parsing ----------------
+    def add_nlp_pattern(self, pattern, template):
+        # Built before the table is touched, so an invalid regex (re.error)
+        # leaves the current patterns in place
+        patterns = dict(self.nlp_patterns)
+        patterns[pattern] = template
+        self.nlp_matcher = NLPMatcher(patterns)
+        self.nlp_patterns = patterns
+
     def parse_nlp(self, command):
         cmd = command.lower().strip()
-        for pattern, template in self.nlp_patterns.items():
-            match = re.match(pattern, cmd)
-            if match:
-                groups = match.groups()
-                return template.format(*groups)
-        return command
+        translated = self.nlp_matcher.match(cmd)
+        return command if translated is None else translated
+
+    # ---------------- Command Registry ----------------
+    def register_command(self, name, handler, render=None):
+        """Add or replace a command; `handler(args)` returns its result."""
+        name = name.lower()
+        self.commands[name] = handler
+        if render is None:
+            self.renderers.pop(name, None)
+        else:
+            self.renderers[name] = render
+
+    def unregister_command(self, name):
+        self.renderers.pop(name.lower(), None)
+        return self.commands.pop(name.lower(), None) is not None
+
+    def get_command_stats(self):
+        return self.command_stats.snapshot()
+
+    # ---------------- Readline ----------------
+    def setup_readline(self):
+        readline.parse_and_bind("tab: complete")
+        readline.parse_and_bind(r'"\C-r": reverse-search-history')
+        readline.set_completer(self.completer)
+        # Seed readline with past commands so Ctrl-R searches them too
+        readline.clear_history()
+        readline.set_history_length(self.history.maxlen or -1)
+        for entry in self.history:
+            readline.add_history(parse_entry(entry)[1])
 
     # ---------------- Tab completion ----------------
     def completer(self, text, state):
-        commands = ['ls','cd','pwd','mkdir','rmdir','rm','touch','mv','cp','cat',
-                    'echo','clear','history','help','exit','quit',
-                    'cpu','memory','processes']
-        matches = [c for c in commands if c.startswith(text)]
+        matches = sorted(c for c in self.commands if c.startswith(text))
         return matches[state] if state < len(matches) else None
 
     # ---------------- Command Execution ----------------
-    def execute(self, command):
-        if not command.strip():
-            return
+    def _resolve(self, command):
         self.save_history(command)
         command = self.parse_nlp(command)
         parts = command.strip().split()
         cmd = parts[0].lower()
-        args = parts[1:]
+        handler = self.commands.get(cmd)
+        if cmd in SHELL_WORD_BUILTINS and handler is not None:
+            parts = split_shell_words(command)
+            if parts is None:
+                handler = None
+        return command, cmd, None if handler is None else parts[1:], handler
+
+    def run_command(self, command):
+        """Run `command` and return a CommandResult, or None for a blank line."""
+        if not command.strip():
+            return None
+        try:
+            command, cmd, args, handler = self._resolve(command)
+        except Exception as e:
+            return CommandResult("nlp", error=f"Error: {e}")
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                return CommandResult("system", self.system_command(command), render=render_system)
+            data = handler(args)
+            if isinstance(data, GeneratorType):
+                data = list(data)
+            return CommandResult(cmd, data, render=self.renderers.get(cmd, render_default))
+        except CommandError as e:
+            return CommandResult(cmd, error=str(e))
+        except Exception as e:
+            return CommandResult(cmd, error=f"Error: {e}")
+        finally:
+            self.command_stats.record(cmd if handler else "system", time.perf_counter() - start)
+
+    def execute(self, command):
+        result = self.run_command(command)
+        return None if result is None else result.text()
+
+    def execute_stream(self, command, idle_timeout=None):
+        """Like execute, but yield output text incrementally.
 
+        System commands are streamed as they produce output; built-ins yield
+        their whole output at once. With `idle_timeout`, an empty string is
+        yielded whenever no output arrived for that many seconds.
+        """
+        if not command.strip():
+            return
         try:
-            if cmd == 'ls':
-                return self.cmd_ls(args)
-            elif cmd == 'pwd':
-                return self.cmd_pwd()
-            elif cmd == 'cd':
-                return self.cmd_cd(args)
-            elif cmd == 'mkdir':
-                return self.cmd_mkdir(args)
-            elif cmd == 'rmdir':
-                return self.cmd_rmdir(args)
-            elif cmd == 'rm':
-                return self.cmd_rm(args)
-            elif cmd == 'touch':
-                return self.cmd_touch(args)
-            elif cmd == 'mv':
-                return self.cmd_mv(args)
-            elif cmd == 'cp':
-                return self.cmd_cp(args)
-            elif cmd == 'cat':
-                return self.cmd_cat(args)
-            elif cmd == 'echo':
-                return self.cmd_echo(args)
-            elif cmd == 'history':
-                return self.cmd_history(args)
-            elif cmd == 'clear':
-                os.system('cls' if os.name=='nt' else 'clear')
-                return ""
-            elif cmd == 'cpu':
-                return self.cmd_cpu()
-            elif cmd == 'memory':
-                return self.cmd_memory()
-            elif cmd == 'processes':
-                return self.cmd_processes()
-            elif cmd in ['exit','quit']:
-                return "exit"
+            command, cmd, args, handler = self._resolve(command)
+        except Exception as e:
+            yield f"Error: {e}"
+            return
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                yield from self.stream_system_command(command, idle_timeout)
+            else:
+                yield from self._stream_builtin(cmd, handler, args)
+        finally:
+            self.command_stats.record(cmd if handler else "system", time.perf_counter() - start)
+
+    def _stream_builtin(self, cmd, handler, args):
+        # Generator results are rendered and sent STREAM_BATCH_ITEMS at a time
+        render = self.renderers.get(cmd, render_default)
+        separator = ""
+        try:
+            data = handler(args)
+            if isinstance(data, GeneratorType):
+                for batch in iter(lambda: list(islice(data, STREAM_BATCH_ITEMS)), []):
+                    yield separator + render(batch)
+                    separator = "\n"
+                output = "" if separator else render([])
             else:
-                return self.system_command(command)
+                output = render(data)
+        except CommandError as e:
+            output = separator + str(e)
         except Exception as e:
-            return f"Error: {e}"
+            output = separator + f"Error: {e}"
+        if output:
+            yield output
 
     # ---------------- Commands ----------------
     def normalize_path(self, path):
-        return os.path.abspath(os.path.expanduser(path))
+        return os.path.abspath(os.path.join(self.cwd, os.path.expanduser(path)))
 
+    @builtin('ls', render=render_ls)
     def cmd_ls(self, args):
-        path = self.normalize_path(args[0]) if args else os.getcwd()
+        usage = "ls: usage: ls [-l] [-a] [-R] [--sort name|size|mtime|none] [path]"
+        args = list(args)
+        long = show_all = recursive = False
+        sort, path = "name", None
+        while args:
+            arg = args.pop(0)
+            if arg == "--sort":
+                if not args or args[0] not in ("name", "size", "mtime", "none"):
+                    raise CommandError(usage)
+                sort = args.pop(0)
+            elif arg.startswith("-") and len(arg) > 1:
+                if not set(arg[1:]) <= set("laR"):
+                    raise CommandError(usage)
+                long = long or "l" in arg
+                show_all = show_all or "a" in arg
+                recursive = recursive or "R" in arg
+            elif path is None:
+                path = arg
+            else:
+                raise CommandError(usage)
+        path = self.normalize_path(path) if path else self.cwd
+        if not os.path.isdir(path):
+            raise CommandError(f"ls: '{path}' " + ("is not a directory" if os.path.exists(path)
+                                                  else "does not exist"))
+        rows = list_dir(path, show_all, long, recursive, sort)
         try:
-            entries = sorted(os.listdir(path))
-            return "\n".join(entries) if entries else "(empty)"
-        except Exception as e:
-            return f"ls error: {e}"
+            if not long:
+                yield from (name for name, *_ in rows)
+                return
+            for name, kind, size, mtime, mode in rows:
+                yield {"name": name, "type": kind, "size": size, "mtime": mtime,
+                       "mode": stat.filemode(mode)}
+        except OSError as e:
+            raise CommandError(f"ls error: {e}")
 
-    def cmd_pwd(self):
-        return os.getcwd()
+    @builtin('pwd')
+    def cmd_pwd(self, args=None):
+        return self.cwd
 
+    @builtin('cd', render=render_cd)
     def cmd_cd(self, args):
         if not args:
-            return "cd: missing argument"
+            raise CommandError("cd: missing argument")
         path = self.normalize_path(args[0])
         if not os.path.exists(path):
-            return f"cd: '{path}' does not exist"
+            raise CommandError(f"cd: '{path}' does not exist")
         if not os.path.isdir(path):
-            return f"cd: '{path}' is not a directory"
-        os.chdir(path)
-        return f"Changed directory to '{path}'"
+            raise CommandError(f"cd: '{path}' is not a directory")
+        self.cwd = path
+        return {"cwd": path}
 
+    @builtin('mkdir', render=render_mkdir)
     def cmd_mkdir(self, args):
         if not args:
-            return "mkdir: missing argument"
-        output = []
+            raise CommandError("mkdir: missing argument")
+        created = []
         for path in args:
             path = self.normalize_path(path)
             os.makedirs(path, exist_ok=True)
-            output.append(f"Directory '{path}' created successfully")
-        return "\n".join(output)
+            created.append(path)
+        return created
 
+    @builtin('rmdir', render=render_rmdir)
     def cmd_rmdir(self, args):
+        recursive = "-r" in args
+        args = [arg for arg in args if arg != "-r"]
         if not args:
-            return "rmdir: missing argument"
-        output = []
-        for path in args:
-            path = self.normalize_path(path)
-            if os.path.isdir(path):
+            raise CommandError("rmdir: missing argument")
+        results = []
+        for arg in args:
+            path = self.normalize_path(arg)
+            refused = self._refuse_removal(arg, path)
+            if not os.path.isdir(path):
+                results.append({"path": path, "removed": False, "error": "not a directory"})
+            elif refused:
+                results.append({"path": path, "removed": False, "error": refused})
+            elif recursive:
+                results.append(self._trash(path))
+            else:
                 try:
                     os.rmdir(path)
-                    output.append(f"Directory '{path}' removed successfully")
+                    results.append({"path": path, "removed": True})
                 except OSError:
-                    output.append(f"rmdir: '{path}' not empty")
-            else:
-                output.append(f"rmdir: '{path}' not a directory")
-        return "\n".join(output)
+                    results.append({"path": path, "removed": False,
+                                    "error": "not empty (use rmdir -r)"})
+        return results
 
+    @builtin('rm', render=render_rm)
     def cmd_rm(self, args):
-        if not args:
-            return "rm: missing operand"
-        output = []
-        for path in args:
-            path = self.normalize_path(path)
-            if os.path.isfile(path):
+        flags, paths = set(), []
+        for arg in args:
+            if arg.startswith("-") and len(arg) > 1 and set(arg[1:]) <= set("rRf"):
+                flags.update(arg[1:])
+            else:
+                paths.append(arg)
+        if not paths:
+            raise CommandError("rm: missing operand")
+        results = []
+        for arg in paths:
+            path = self.normalize_path(arg)
+            if os.path.islink(path) or os.path.isfile(path):
                 os.remove(path)
-                output.append(f"File '{path}' removed successfully")
+                results.append({"path": path, "removed": True})
             elif os.path.isdir(path):
-                output.append(f"rm: '{path}' is a directory (use rmdir)")
-            else:
-                output.append(f"rm: '{path}' not found")
-        return "\n".join(output)
+                refused = self._refuse_removal(arg, path)
+                if refused:
+                    results.append({"path": path, "removed": False, "error": refused})
+                elif flags & {"r", "R"}:
+                    results.append(self._trash(path))
+                else:
+                    results.append({"path": path, "removed": False,
+                                    "error": "is a directory (use rm -r)"})
+            elif "f" not in flags:
+                results.append({"path": path, "removed": False, "error": "not found"})
+        return results
 
+    def _refuse_removal(self, arg, path):
+        # As GNU rm does, never remove '.' or '..', nor the directory this
+        # terminal works in (or one containing it): its commands would all
+        # fail afterwards. The root and the trash itself are off limits too.
+        if os.path.basename(arg.rstrip("/\\")) in (".", ".."):
+            return "refusing to remove '.' or '..' directory"
+        try:
+            contains_cwd = os.path.commonpath([path, self.cwd]) == path
+        except ValueError:      # different drives on Windows
+            contains_cwd = False
+        if contains_cwd:
+            return "refusing to remove the current directory or one containing it"
+        if path == os.path.dirname(path) or os.path.basename(path) == TRASH_DIR_NAME:
+            return "refusing to remove"
+        return None
+
+    def _trash(self, path):
+        # Recursive delete: rename into the trash now, delete in the background
+        try:
+            get_trash().remove(path)
+        except OSError as e:
+            return {"path": path, "removed": False, "error": e.strerror or str(e)}
+        return {"path": path, "removed": True, "trashed": True}
+
+    @builtin('trash', render=render_trash)
+    def cmd_trash(self, args):
+        if args and args != ["status"]:
+            raise CommandError("trash: usage: trash [status]")
+        return get_trash().status()
+
+    @builtin('touch', render=render_touch)
     def cmd_touch(self, args):
         if not args:
-            return "touch: missing file operand"
-        output = []
+            raise CommandError("touch: missing file operand")
+        created = []
         for file in args:
             path = self.normalize_path(file)
             open(path, 'a').close()
-            output.append(f"File '{path}' created successfully")
-        return "\n".join(output)
+            created.append(path)
+        return created
 
+    @builtin('mv', render=render_mv)
     def cmd_mv(self, args):
         if len(args) < 2:
-            return "mv: missing source/destination"
+            raise CommandError("mv: missing source/destination")
         src, dest = self.normalize_path(args[0]), self.normalize_path(args[1])
         os.rename(src, dest)
-        return f"'{src}' renamed/moved to '{dest}' successfully"
+        return {"source": src, "destination": dest}
 
+    @builtin('cp', render=render_cp)
     def cmd_cp(self, args):
         if len(args) < 2:
-            return "cp: missing source/destination"
-        import shutil
+            raise CommandError("cp: missing source/destination")
         src, dest = self.normalize_path(args[0]), self.normalize_path(args[1])
+        if not os.path.lexists(src):
+            raise CommandError(f"cp: '{src}' not found")
+        if os.path.isdir(dest):
+            dest = os.path.join(dest, os.path.basename(src))
+        start = time.perf_counter()
         if os.path.isdir(src):
-            shutil.copytree(src, dest)
-            return f"Directory '{src}' copied to '{dest}' successfully"
+            if os.path.commonpath([src, dest]) == src:
+                raise CommandError(f"cp: cannot copy '{src}' into itself")
+            result = {"source": src, "destination": dest, "type": "directory"}
+            result.update(copy_tree(src, dest))
         else:
-            shutil.copy2(src, dest)
-            return f"File '{src}' copied to '{dest}' successfully"
+            if not os.path.isfile(src):
+                raise CommandError(f"cp: '{src}' is not a regular file")
+            if os.path.exists(dest) and os.path.samefile(src, dest):
+                raise CommandError(f"cp: '{src}' and '{dest}' are the same file")
+            result = {"source": src, "destination": dest, "type": "file",
+                      "files": 1, "dirs": 0, "symlinks": 0, "bytes": copy_file(src, dest),
+                      "errors": []}
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        result.update(seconds=elapsed, bytes_per_sec=result["bytes"] / elapsed,
+                      files_per_sec=result["files"] / elapsed)
+        return result
 
+    @builtin('cat', render=render_cat)
     def cmd_cat(self, args):
-        if not args:
-            return "cat: missing file operand"
-        output = []
-        for file in args:
+        # At most CAT_MAX_BYTES are returned per call; the rest is read by
+        # passing the continuation token back with --continue
+        usage = "cat: usage: cat [--head N | --tail N | --bytes A-B | --continue TOKEN] file..."
+        args = list(args)
+        mode = value = None
+        files = []
+        while args:
+            arg = args.pop(0)
+            if arg in ("--head", "--tail", "--bytes", "--continue"):
+                if mode or not args:
+                    raise CommandError(usage)
+                mode, value = arg[2:], args.pop(0)
+                if mode in ("head", "tail") and not value.isdigit():
+                    raise CommandError(f"cat: invalid line count '{value}'")
+            else:
+                files.append(arg)
+        if not files:
+            raise CommandError("cat: missing file operand")
+        if mode == "continue" and len(files) != 1:
+            raise CommandError("cat: --continue takes exactly one file")
+
+        results = []
+        budget = CAT_MAX_BYTES
+        for file in files:
             file = self.normalize_path(file)
-            if os.path.isfile(file):
-                with open(file, 'r') as f:
-                    output.append(f.read())
+            if not os.path.isfile(file):
+                results.append({"path": file, "error": "not found"})
+                continue
+            truncated = False
+            try:
+                if mode == "continue":
+                    inode, start, end = parse_page_token(value)
+                    if os.stat(file).st_ino != inode:
+                        raise ValueError("file was replaced since the token was issued")
+                    data, stop, size, inode = read_page(file, start, end, budget)
+                elif os.path.getsize(file) == 0:
+                    # /proc, /sys and the like report no size: read what is
+                    # there (bounded), then take the range from that
+                    content, truncated = read_unsized(file, budget)
+                    size = len(content)
+                    if mode in ("head", "tail"):
+                        start, end = buffer_line_range(content, **{mode: int(value)})
+                    elif mode == "bytes":
+                        start, end = parse_byte_range(value, size)
+                    else:
+                        start, end = 0, size
+                    data, stop = content[start:end], end
+                else:
+                    if mode == "head":
+                        start, end = line_range(file, head=int(value))
+                    elif mode == "tail":
+                        start, end = line_range(file, tail=int(value))
+                    elif mode == "bytes":
+                        start, end = parse_byte_range(value, os.path.getsize(file))
+                    else:
+                        start, end = 0, os.path.getsize(file)
+                    data, stop, size, inode = read_page(file, start, end, budget)
+            except ValueError as e:
+                raise CommandError(f"cat: {e}")
+            except OSError as e:
+                results.append({"path": file, "error": e.strerror or str(e)})
+                continue
+            budget -= len(data)
+            result = {"path": file, "content": data.decode("utf-8", "replace"),
+                      "start": start, "end": stop, "size": size}
+            if truncated:
+                # Without a size there is no stable offset to continue from
+                result["truncated"] = True
+            elif stop < min(end, size):
+                result["next"] = page_token(inode, stop, end)
+            results.append(result)
+        return results
+
+    @builtin('grep', render=render_grep)
+    def cmd_grep(self, args):
+        usage = "grep: usage: grep [-i] [-r] [-l] [-F] [-n] [--max N] pattern [path...]"
+        args = list(args)
+        opts, operands = set(), []
+        max_results = GREP_MAX_RESULTS
+        while args:
+            arg = args.pop(0)
+            if arg == "--":
+                operands.extend(args)
+                break
+            if arg == "--max":
+                if not args or not args[0].isdigit():
+                    raise CommandError(usage)
+                max_results = int(args.pop(0))
+            elif arg.startswith("-") and len(arg) > 1:
+                # -n is accepted out of habit; line numbers are always shown
+                if not set(arg[1:]) <= set("irlFn"):
+                    raise CommandError(usage)
+                opts.update(arg[1:])
             else:
-                output.append(f"cat: '{file}' not found")
-        return "\n".join(output)
+                operands.append(arg)
+        if not operands:
+            raise CommandError(usage)
+        pattern, paths = operands[0], self._expand_paths(operands[1:])
+        recursive = "r" in opts
+        if not paths:
+            if not recursive:
+                raise CommandError("grep: missing file operand (or use -r to search here)")
+            paths = [self.cwd]
+        for path in paths:
+            if not os.path.exists(path):
+                raise CommandError(f"grep: '{path}' not found")
+            if os.path.isdir(path) and not recursive:
+                raise CommandError(f"grep: '{path}' is a directory (use -r)")
+        try:
+            grep_regex(pattern, "i" in opts, "F" in opts)
+        except re.error as e:
+            raise CommandError(f"grep: invalid pattern: {e}")
+        # Ask for one match more than the cap to know whether output was cut
+        matches = grep(pattern, paths, "i" in opts, "F" in opts, recursive,
+                       max_results + 1, "l" in opts)
+        return self._capped(matches, max_results, self._grep_match("l" in opts))
+
+    def _expand_paths(self, operands):
+        # Wildcards are expanded like the shell does, and kept as typed
+        # when nothing matches so the caller reports them as not found
+        paths = []
+        for operand in operands:
+            path = self.normalize_path(operand)
+            paths.extend(sorted(glob.glob(path)) or [path])
+        return paths
+
+    def _grep_match(self, files_only):
+        def convert(match):
+            path, line, text = match
+            path = self._display_path(path)
+            return {"path": path} if files_only else {"path": path, "line": line, "text": text}
+        return convert
 
+    @builtin('find', render=render_find)
+    def cmd_find(self, args):
+        usage = ("find: usage: find [path] [-name GLOB] [-iname GLOB] [-type f|d|l] "
+                 "[-size [+-]N[ckMG]] [-mtime [+-]N] [-maxdepth N] [--max-results N]")
+        args = list(args)
+        path = args.pop(0) if args and not args[0].startswith("-") else None
+        tests = {}
+        max_depth, max_results = None, FIND_MAX_RESULTS
+        while args:
+            opt = args.pop(0)
+            if not args:
+                raise CommandError(usage)
+            value = args.pop(0)
+            if opt in ("-name", "-iname", "-size", "-mtime"):
+                tests[opt[1:]] = value
+            elif opt == "-type":
+                tests["kind"] = value
+            elif opt in ("-maxdepth", "--max-results") and value.isdigit():
+                if opt == "-maxdepth":
+                    max_depth = int(value)
+                else:
+                    max_results = int(value)
+            else:
+                raise CommandError(usage)
+        root = self.normalize_path(path) if path else self.cwd
+        if not os.path.lexists(root):
+            raise CommandError(f"find: '{root}' not found")
+        try:
+            test, needs_stat = find_predicate(**tests)
+        except ValueError as e:
+            raise CommandError(f"find: {e}")
+        return self._capped(find(root, test, needs_stat, max_depth), max_results,
+                            self._display_path)
+
+    @builtin('du', render=render_du)
+    def cmd_du(self, args):
+        usage = "du: usage: du [-s] [-d N] [--rescan] [path...]"
+        args = list(args)
+        depth, rescan, paths = 1, False, []
+        while args:
+            arg = args.pop(0)
+            if arg in ("-d", "--max-depth"):
+                if not args or not args[0].isdigit():
+                    raise CommandError(usage)
+                depth = int(args.pop(0))
+            elif arg == "--rescan":
+                rescan = True
+            elif arg.startswith("-") and len(arg) > 1:
+                # -h is accepted out of habit; sizes are always human-readable
+                if not set(arg[1:]) <= set("sh"):
+                    raise CommandError(usage)
+                if "s" in arg:
+                    depth = 0
+            else:
+                paths.append(arg)
+        results = []
+        for path in self._expand_paths(paths) if paths else [self.cwd]:
+            if not os.path.lexists(path):
+                raise CommandError(f"du: '{path}' not found")
+            try:
+                result = get_size_index().usage(path, depth, rescan)
+            except OSError as e:
+                raise CommandError(f"du: '{path}' {e.strerror or e}")
+            result["path"] = self._display_path(path)
+            for entry in result["entries"] + result["errors"]:
+                entry["path"] = self._display_path(entry["path"])
+            results.append(result)
+        return results
+
+    def _display_path(self, path):
+        # Paths under the working directory are shown relative to it
+        if path.startswith(self.cwd + os.sep):
+            return os.path.relpath(path, self.cwd)
+        return path
+
+    def _capped(self, source, limit, convert):
+        # `source` is asked for limit + 1 items; getting the extra one only
+        # tells us the output was cut, and closing `source` stops its search
+        try:
+            for count, item in enumerate(source):
+                if count == limit:
+                    yield {"truncated": True, "limit": limit}
+                    return
+                yield convert(item)
+        finally:
+            source.close()
+
+    @builtin('echo', render=render_echo)
     def cmd_echo(self, args):
         line = " ".join(args)
         if ">" in line:
@@ -267,62 +848,217 @@ class UnifiedTerminal:
                 file = self.normalize_path(parts[1].strip())
                 with open(file, "a") as f:
                     f.write(parts[0].strip() + "\n")
-                return f"Text appended to '{file}' successfully"
+                return {"text": parts[0].strip(), "file": file, "mode": "append"}
             else:
                 parts = line.split(">")
                 file = self.normalize_path(parts[1].strip())
                 with open(file, "w") as f:
                     f.write(parts[0].strip() + "\n")
-                return f"Text written to '{file}' successfully"
+                return {"text": parts[0].strip(), "file": file, "mode": "write"}
         return line
 
+    @builtin('history', render=render_history)
     def cmd_history(self, args):
         if args and args[0] == "-c":
-            self.history = []
-            open(HISTORY_FILE, 'w').close()
-            return "History cleared"
-        return "\n".join(self.history[-50:])
+            with self._history_lock:
+                self.history.clear()
+                self.history_writer.clear()
+                self.history_index.clear()
+            return {"cleared": True}
+        if args and args[0] == "compact":
+            return {"removed": self.history_writer.compact()}
+        if args and args[0] in ("search", "prefix", "range"):
+            return self.history_query(args[0], args[1:])
+        with self._history_lock:
+            entries = list(islice(self.history, max(0, len(self.history) - 50), None))
+        return {"entries": [_history_entry(*parse_entry(entry)) for entry in entries]}
+
+    def history_query(self, mode, args):
+        if not args:
+            raise CommandError(f"history {mode}: missing argument")
+        self.history_writer.flush()
+        if mode == "search":
+            rows = self.history_index.search(" ".join(args))
+        elif mode == "prefix":
+            rows = self.history_index.prefix(" ".join(args))
+        else:
+            # Timestamps are 'YYYY-MM-DD' or 'YYYY-MM-DDTHH:MM[:SS]'
+            since, until = args[0].replace("T", " "), None
+            if len(args) > 1:
+                until = args[1].replace("T", " ")
+            rows = self.history_index.time_range(since, until)
+        return {"query": mode, "entries": [_history_entry(ts, command) for ts, command in rows]}
+
+    @builtin('clear')
+    def cmd_clear(self, args=None):
+        os.system('cls' if os.name=='nt' else 'clear')
+        return ""
+
+    @builtin('exit', 'quit')
+    def cmd_exit(self, args=None):
+        return "exit"
 
     # ---------------- System Monitoring ----------------
-    def cmd_cpu(self):
+    @builtin('cpu', render=render_cpu)
+    def cmd_cpu(self, args=None):
         if not PSUTIL_AVAILABLE:
-            return "psutil module not installed"
-        usage = psutil.cpu_percent(interval=1, percpu=True)
-        result = "\n".join([f"CPU {i}: {u}%" for i, u in enumerate(usage)])
-        return result
+            raise CommandError("psutil module not installed")
+        sampler = get_cpu_sampler()
+        usage = sampler.latest()
+        if usage is None:
+            raise CommandError("cpu: no sample available yet")
+        return {"cores": usage,
+                "average": {f"{w}s": sampler.average(w) for w in (1, 5, 15)}}
 
-    def cmd_memory(self):
+    @builtin('memory', render=render_memory)
+    def cmd_memory(self, args=None):
         if not PSUTIL_AVAILABLE:
-            return "psutil module not installed"
+            raise CommandError("psutil module not installed")
         mem = psutil.virtual_memory()
-        return f"Total: {mem.total//1024**2} MB\nUsed: {mem.used//1024**2} MB\nFree: {mem.available//1024**2} MB\nPercentage: {mem.percent}%"
+        return {"total": mem.total, "used": mem.used, "available": mem.available,
+                "percent": mem.percent}
 
-    def cmd_processes(self):
+    @builtin('processes', render=render_processes)
+    def cmd_processes(self, args=None):
         if not PSUTIL_AVAILABLE:
-            return "psutil module not installed"
-        processes = []
-        for p in psutil.process_iter(['pid', 'name', 'username']):
-            processes.append(f"{p.info['pid']:>5} {p.info['name'][:20]:<20} {p.info['username']}")
-        return "\n".join(processes[:50])  # Show top 50 processes
+            raise CommandError("psutil module not installed")
+        args = list(args or [])
+        sort, top = "pid", 50
+        while args:
+            opt = args.pop(0)
+            if opt in ("--sort", "--by") and args:
+                sort = args.pop(0)
+                if sort not in ("cpu", "mem", "rss", "io"):
+                    raise CommandError(f"processes: unknown sort key '{sort}' (use cpu, mem, rss or io)")
+            elif opt == "--top" and args and args[0].isdigit():
+                top = int(args.pop(0))
+            else:
+                raise CommandError("processes: usage: processes [--by cpu|mem|rss|io] [--top N]")
+        if sort == "io":
+            return [{"pid": pid, "name": name, "username": username, "io_bytes": io}
+                    for pid, name, username, io in top_processes_by_io(top)]
+        return [{"pid": pid, "name": name, "username": username, "cpu_percent": cpu,
+                 "memory_percent": mem, "rss": rss}
+                for pid, name, username, cpu, mem, rss in get_process_table().rows(sort, top)]
+
+    @builtin('stats', render=render_stats)
+    def cmd_stats(self, args=None):
+        if not PSUTIL_AVAILABLE:
+            raise CommandError("psutil module not installed")
+        args = list(args or [])
+        since = 300
+        if args[:1] == ["--since"] and len(args) == 2:
+            try:
+                since = parse_duration(args[1])
+            except ValueError:
+                raise CommandError(f"stats: invalid duration '{args[1]}' (e.g. 90s, 5m, 1h)")
+        elif args:
+            raise CommandError("stats: usage: stats [--since 5m]")
+        recorder = get_metrics_recorder()
+        series = {}
+        for name, summary in recorder.summary(since).items():
+            if summary is None:
+                raise CommandError("stats: no samples recorded yet")
+            last, low, avg, high = summary
+            series[name] = {"unit": recorder.SERIES[name], "last": last, "min": low,
+                            "avg": avg, "max": high}
+        return {"since": since, "series": series}
 
     # ---------------- System Commands ----------------
+    def _spawn(self, command, **kwargs):
+        # A new session makes the shell a process group leader, so the
+        # whole pipeline can be killed on timeout or cancellation
+        proc = subprocess.Popen(command, shell=True, cwd=self.cwd,
+                                start_new_session=(os.name != 'nt'), **kwargs)
+        SUBPROCESS_SPAWNS.inc()
+        hook = getattr(_spawn_hooks, "hook", None)
+        if hook is not None:
+            hook(proc)
+        return proc
+
     def system_command(self, command):
         try:
-            result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=30)
-            output = result.stdout.strip()
-            if result.stderr:
-                output += "\n" + result.stderr.strip()
-            return output
+            proc = self._spawn(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            start = time.perf_counter()
+            try:
+                stdout, stderr = proc.communicate(timeout=COMMAND_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                kill_process(proc)
+                proc.communicate()
+                raise
+            finally:
+                SUBPROCESS_DURATION.observe(time.perf_counter() - start)
+            return {"stdout": stdout, "stderr": stderr, "returncode": proc.returncode}
         except Exception as e:
-            return f"System command error: {e}"
+            raise CommandError(f"System command error: {e}")
+
+    def stream_system_command(self, command, idle_timeout=None, timeout=COMMAND_TIMEOUT,
+                              chunk_size=STREAM_CHUNK_SIZE, max_buffered=STREAM_MAX_BUFFERED):
+        # The command is killed once it produces no output for `timeout`
+        # seconds; output resets the clock, so long-running commands that keep
+        # printing (builds, tail -f) are not cut off
+        try:
+            proc = self._spawn(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except Exception as e:
+            yield f"System command error: {e}"
+            return
+        start = time.perf_counter()
+        buffer = OutputBuffer(max_buffered)
+
+        def pump():
+            fd = proc.stdout.fileno()
+            try:
+                while True:
+                    chunk = os.read(fd, chunk_size)
+                    if not chunk or not buffer.put(chunk):
+                        break
+            finally:
+                buffer.finish()
+
+        reader = threading.Thread(target=pump, name="stream-reader", daemon=True)
+        reader.start()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        deadline = time.monotonic() + timeout
+        at_line_start = True
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield (("" if at_line_start else "\n") +
+                           f"System command error: no output for {timeout:g} seconds, killed")
+                    return
+                chunk = buffer.get(remaining if idle_timeout is None
+                                   else min(idle_timeout, remaining))
+                if chunk is None:
+                    break
+                if chunk:
+                    deadline = time.monotonic() + timeout
+                text = decoder.decode(chunk)
+                if text:
+                    at_line_start = text.endswith("\n")
+                if text or idle_timeout is not None:
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+        finally:
+            # Runs on normal exit and when the consumer disconnects early
+            buffer.close()
+            kill_process(proc)
+            reader.join()
+            proc.stdout.close()
+            proc.wait()
+            SUBPROCESS_DURATION.observe(time.perf_counter() - start)
 
     # ---------------- Main Loop ----------------
     def run(self):
         print("Unified Python Terminal (Supports NLP & Direct Commands)")
         print("Type 'exit' to quit, 'help' for command list")
+        if READLINE_AVAILABLE:
+            self.setup_readline()
         while True:
             try:
-                cmd = input(f"{os.getcwd()}$ ")
+                cmd = input(f"{self.cwd}$ ")
                 output = self.execute(cmd)
                 if output == "exit":
                     break
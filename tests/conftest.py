@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Shared test setup:
+- Puts the project root on sys.path, since the modules aren't installed
+- `terminal` fixture: a UnifiedTerminal working in, and keeping its history
+  under, the test's tmp_path
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from terminal import UnifiedTerminal  # noqa: E402
+
+
+@pytest.fixture
+def terminal(tmp_path):
+    term = UnifiedTerminal(history_file=str(tmp_path / "history.txt"), cwd=str(tmp_path))
+    yield term
+    term.close()
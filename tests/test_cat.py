@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Regression tests for cat:
+- Files without a size (/proc, /sys) are read instead of printing nothing
+- head/tail and paging agree with the file's contents, with pread and
+  with the seek-and-read fallback used where pread is missing
+"""
+
+import os
+
+import pytest
+
+import fileops
+from fileops import buffer_line_range, line_range, read_page
+
+
+@pytest.fixture(autouse=True, params=["pread", "seek"])
+def read_method(request, monkeypatch):
+    # Also run everything with the seek-and-read fallback used on Windows
+    if request.param == "seek":
+        monkeypatch.setattr(fileops, "_pread", fileops._seek_read)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc")
+def test_cat_proc_file(terminal):
+    assert terminal.execute("cat /proc/self/status").startswith("Name:")
+    assert terminal.execute("cat --head 1 /proc/self/status").startswith("Name:")
+
+
+@pytest.mark.parametrize("data", [b"", b"one", b"a\nb\nc", b"a\nb\nc\n", b"\n\n\n"])
+@pytest.mark.parametrize("count", [0, 1, 2, 5])
+def test_line_ranges(tmp_path, data, count):
+    path = tmp_path / "f.txt"
+    path.write_bytes(data)
+    lines = data.splitlines(keepends=True)
+    start, end = line_range(str(path), head=count)
+    assert data[start:end] == b"".join(lines[:count])
+    start, end = line_range(str(path), tail=count)
+    assert data[start:end] == (b"".join(lines[-count:]) if count else b"")
+    assert buffer_line_range(data, tail=count) == (start, end)
+
+
+def test_pages_never_split_characters(tmp_path):
+    data = ("é€😀x" * 5000).encode()
+    path = tmp_path / "f.txt"
+    path.write_bytes(data)
+    pages, start = [], 0
+    while start < len(data):
+        page, start, _, _ = read_page(str(path), start, len(data), limit=1001)
+        pages.append(page.decode())
+    assert "".join(pages).encode() == data
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the cp copy engine:
+- Copying a file onto itself is refused and leaves the file intact
+- FIFOs and other special files in a tree are reported, not read
+"""
+
+import os
+import shutil
+import threading
+
+import pytest
+
+from fileops import copy_file, copy_tree
+
+
+def test_copy_file_onto_itself_is_refused(tmp_path):
+    src = tmp_path / "a.txt"
+    src.write_text("keep me")
+    with pytest.raises(shutil.SameFileError):
+        copy_file(str(src), str(src))
+    assert src.read_text() == "keep me"
+
+
+@pytest.mark.parametrize("command", ["cp a.txt a.txt", "cp a.txt .", "cp a.txt link.txt"])
+def test_cp_onto_itself_keeps_the_file(terminal, tmp_path, command):
+    src = tmp_path / "a.txt"
+    src.write_text("keep me")
+    os.link(src, tmp_path / "link.txt")
+    result = terminal.run_command(command)
+    assert not result.ok
+    assert "same file" in result.error
+    assert src.read_text() == "keep me"
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs FIFOs")
+def test_copy_tree_reports_fifos(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "data.txt").write_text("data")
+    os.mkfifo(src / "pipe")
+
+    stats = {}
+    worker = threading.Thread(target=lambda: stats.update(copy_tree(str(src), str(tmp_path / "dst"))),
+                              daemon=True)
+    worker.start()
+    worker.join(timeout=10)
+    assert not worker.is_alive(), "copy_tree blocked on a FIFO"
+    assert stats["files"] == 1
+    assert len(stats["errors"]) == 1 and "pipe" in stats["errors"][0]
+    assert (tmp_path / "dst" / "data.txt").read_text() == "data"
+    assert not (tmp_path / "dst" / "pipe").exists()
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs FIFOs")
+def test_cp_refuses_a_fifo(terminal, tmp_path):
+    os.mkfifo(tmp_path / "pipe")
+    result = terminal.run_command("cp pipe copy")
+    assert not result.ok
+    assert "not a regular file" in result.error
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Regression tests for du:
+- Wildcard operands are expanded, as `du -sh *` is in a shell
+- An unreadable root is a command error, not a KeyError
+- Unreadable subdirectories are reported, like GNU du does
+"""
+
+import errno
+import os
+
+import pytest
+
+import fileops
+import terminal as terminal_module
+from fileops import SizeIndex
+from terminal import CommandError
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = SizeIndex(str(tmp_path / "du.db"), workers=2)
+    monkeypatch.setattr(terminal_module, "get_size_index", lambda: index)
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ("a", "b", "b/locked", ".hidden"):
+        (tmp_path / "tree" / name).mkdir(parents=True)
+        (tmp_path / "tree" / name / "data").write_bytes(b"x" * 10_000)
+    (tmp_path / "tree" / "file").write_bytes(b"x" * 10_000)
+    return tmp_path / "tree"
+
+
+def _deny(monkeypatch, *denied):
+    scan = fileops._scan_sizes
+
+    def scan_sizes(path):
+        if path in denied:
+            raise PermissionError(errno.EACCES, "Permission denied", path)
+        return scan(path)
+    monkeypatch.setattr(fileops, "_scan_sizes", scan_sizes)
+
+
+def test_wildcards_are_expanded(terminal, index, tree):
+    terminal.cwd = str(tree)
+    results = terminal.cmd_du(["-sh", "*"])
+    assert [r["path"] for r in results] == ["a", "b", "file"]
+    assert all(r["total"] >= 10_000 for r in results)
+
+
+def test_wildcard_without_matches_is_not_found(terminal, index, tree):
+    terminal.cwd = str(tree)
+    with pytest.raises(CommandError, match="not found"):
+        terminal.cmd_du(["*.nothing"])
+
+
+def test_unreadable_root_is_a_command_error(terminal, index, tree, monkeypatch):
+    _deny(monkeypatch, str(tree))
+    with pytest.raises(CommandError, match="Permission denied"):
+        terminal.cmd_du([str(tree)])
+
+
+def test_unreadable_subdirectory_is_reported(terminal, index, tree, monkeypatch):
+    locked = str(tree / "b" / "locked")
+    _deny(monkeypatch, locked)
+    result = index.usage(str(tree), rescan=True)
+    assert result["errors"] == [{"path": locked, "error": "Permission denied"}]
+    assert locked not in [entry["path"] for entry in result["entries"]]
+
+    terminal.cwd = str(tree)
+    text = terminal.execute("du")
+    line = f"du: cannot read directory '{os.path.join('b', 'locked')}': Permission denied"
+    assert line in text.splitlines()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Regression tests for find's command line:
+- Quoted globs lose their quotes, as they would in a shell
+- Pipes and redirection run the line in the system shell
+"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    for name in ("a.py", "pkg/b.py", "pkg/c.txt", "my file.py"):
+        (tmp_path / name).write_text("x")
+    return tmp_path
+
+
+@pytest.mark.parametrize("glob", ['"*.py"', "'*.py'", "*.py"])
+def test_quoted_name_glob(terminal, tree, glob):
+    result = terminal.run_command(f"find . -name {glob}")
+    assert result.ok
+    assert sorted(result.data) == ["a.py", "my file.py", os.path.join("pkg", "b.py")]
+
+
+def test_quoted_path_with_spaces(terminal, tree):
+    result = terminal.run_command("find 'my file.py'")
+    assert result.ok and result.data == ["my file.py"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="needs a POSIX shell")
+def test_pipes_run_in_the_shell(terminal, tree):
+    result = terminal.run_command("find . -name '*.py' | wc -l")
+    assert result.name == "system"
+    assert result.text().strip() == "3"
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Regression tests for grep:
+- Chunked scanning finds the same lines, with the same numbers, as a
+  line-by-line search, whatever the chunk size
+- A file truncated mid-search doesn't crash the process (mmap raised SIGBUS)
+- The command line is split like a shell would: quotes group and are
+  removed, unknown options are rejected, and pipes run in the shell
+"""
+
+import os
+import re
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import fileops
+from fileops import grep_file, grep_regex
+from terminal import CommandError, split_shell_words
+
+
+def _naive(path, pattern):
+    with open(path, 'rb') as f:
+        return [(path, n, line.rstrip(b"\n").decode())
+                for n, line in enumerate(f, 1) if re.search(pattern.encode(), line)]
+
+
+@pytest.mark.parametrize("chunk", [7, 64, 4096])
+def test_chunks_match_line_by_line_search(tmp_path, monkeypatch, chunk):
+    monkeypatch.setattr(fileops, "_GREP_CHUNK", chunk)
+    path = str(tmp_path / "f.txt")
+    with open(path, "w") as f:
+        for i in range(2000):
+            f.write(("x" * (i % 97)) + (" hit" if i % 13 == 0 else "") + f" {i}\n")
+        f.write("last hit without newline")
+    for pattern in ("hit", "^x{90}", r"\d+$", "nomatch"):
+        assert grep_file(grep_regex(pattern, False, False), path, 10_000) == _naive(path, pattern)
+
+
+def test_truncated_file_does_not_crash(tmp_path):
+    path = tmp_path / "big.log"
+    path.write_bytes(b"some log line\n" * 800_000)
+    script = textwrap.dedent(f"""
+        import os, sys, threading
+        sys.path.insert(0, {os.path.dirname(os.path.abspath(fileops.__file__))!r})
+        from fileops import grep_file, grep_regex
+        path = {str(path)!r}
+        def truncate():
+            os.truncate(path, 100)
+        threading.Timer(0.001, truncate).start()
+        for _ in range(3):
+            grep_file(grep_regex("line", False, False), path, 10**9)
+            with open(path, "wb") as f:
+                f.write(b"some log line\\n" * 800_000)
+            threading.Timer(0.001, truncate).start()
+    """)
+    assert subprocess.run([sys.executable, "-c", script], timeout=60).returncode == 0
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "a.py").write_text("hello world\nbye\n")
+    (tmp_path / "b.py").write_text("say 'hello world'\n")
+    (tmp_path / "c.txt").write_text("hello\n")
+    return tmp_path
+
+
+def test_split_shell_words():
+    assert split_shell_words("grep 'a|b' \"x y\"") == ["grep", "a|b", "x y"]
+    for line in ("grep a f | wc -l", "grep a f>out", "grep a f; ls", "grep a f &",
+                 "grep 'unbalanced f"):
+        assert split_shell_words(line) is None
+
+
+def test_combined_options_and_quoted_pattern(terminal, tree):
+    matches = terminal.cmd_grep(["-rn", "hello world", "."])
+    assert sorted((m["path"], m["line"]) for m in matches) == [("a.py", 1), ("b.py", 1)]
+    result = terminal.run_command("grep -rn 'hello world' .")
+    assert result.ok and len(result.data) == 2
+
+
+def test_unknown_option_is_a_usage_error(terminal, tree):
+    with pytest.raises(CommandError, match="usage"):
+        list(terminal.cmd_grep(["-x", "hello", "a.py"]))
+
+
+def test_wildcard_paths_are_expanded(terminal, tree):
+    assert {m["path"] for m in terminal.cmd_grep(["hello", "*.py"])} == {"a.py", "b.py"}
+    with pytest.raises(CommandError, match="not found"):
+        list(terminal.cmd_grep(["hello", "*.md"]))
+
+
+@pytest.mark.skipif(os.name == "nt", reason="needs a POSIX shell")
+def test_pipes_run_in_the_shell(terminal, tree):
+    result = terminal.run_command("grep -r hello . | wc -l")
+    assert result.name == "system"
+    assert result.text().strip() == "3"
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Regression tests for history prefix search: the index path (few matches)
+and the newest-first id walk (many matches) return the same entries
+"""
+
+import pytest
+
+import history
+from history import HistoryIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "history.txt"
+    commands = [f"ls dir{i}" if i % 3 else f"git commit {i}" for i in range(300)]
+    path.write_text("".join(f"[2025-01-01 00:00:{i % 60:02d}] {c}\n" for i, c in enumerate(commands)))
+    idx = HistoryIndex(str(tmp_path / "history.db"), str(path))
+    yield idx
+    idx.close()
+
+
+@pytest.mark.parametrize("sort_max", [1, 10, 1000])
+@pytest.mark.parametrize("prefix", ["ls", "git", "git commit 29", "ls dir1", "zzz", ""])
+def test_prefix_returns_newest_matches(index, monkeypatch, sort_max, prefix):
+    monkeypatch.setattr(history, "_PREFIX_SORT_MAX", sort_max)
+    rows = index.prefix(prefix, limit=20)
+    expected = [r for r in index._query("1", (), 10_000) if r[1].startswith(prefix)][-20:]
+    assert rows == expected
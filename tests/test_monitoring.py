@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Regression tests for duration parsing (/metrics/series?since=, stats --since)
+"""
+
+import pytest
+
+from monitoring import parse_duration
+
+
+@pytest.mark.parametrize("text, seconds", [("90", 90), ("90s", 90), ("5m", 300),
+                                           ("1.5h", 5400), ("1d", 86400)])
+def test_valid_durations(text, seconds):
+    assert parse_duration(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["inf", "infm", "nan", "-5m", "0", "0s", "", "m", "abc"])
+def test_invalid_durations(text):
+    with pytest.raises(ValueError):
+        parse_duration(text)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Regression tests for NLP phrase matching:
+- Patterns the old sequential re.match loop accepted still work once
+  combined: shared group names, inline flags, backreferences, top-level '|'
+- NLP failures come back as command errors instead of exceptions
+"""
+
+import pytest
+
+from nlp_terminal import DEFAULT_NLP_PATTERNS, NLPMatcher
+
+
+@pytest.fixture
+def matcher():
+    return NLPMatcher(DEFAULT_NLP_PATTERNS)
+
+
+def test_shared_group_names(matcher):
+    matcher.add(r'open file (?P<f>\S+) now', 'cat {0}')
+    matcher.add(r'open (?P<f>\S+)', 'cat {0}')
+    assert matcher.match("open file a.txt now") == "cat a.txt"
+    assert matcher.match("open b.txt") == "cat b.txt"
+    assert matcher.match("current directory") == "pwd"
+
+
+def test_inline_flags_and_backreferences(matcher):
+    matcher.add(r'(?i)shout (\S+)', 'echo {0}')
+    matcher.add(r'twice (\S+) \1', 'echo {0}')
+    assert matcher.match("shout hi") == "echo hi"
+    assert matcher.match("twice a a") == "echo a"
+    assert matcher.match("twice a b") is None
+
+
+def test_top_level_alternation_is_not_routed_by_first_word(matcher):
+    matcher.add(r'goto (\S+)|go to (\S+)', 'cd {0}')
+    assert matcher.match("goto x") == "cd x"
+    assert matcher.match("go to x") is not None
+
+
+@pytest.mark.parametrize("pattern", [r'make ?dir (\S+)', r'make *dir (\S+)',
+                                     r'make {0,1}dir (\S+)'])
+def test_optional_space_is_not_routed_by_first_word(matcher, pattern):
+    matcher.add(pattern, 'mkdir {0}')
+    assert matcher.match("makedir q") == "mkdir q"
+    assert matcher.match("make dir q") == "mkdir q"
+
+
+def test_registration_order_wins_across_isolated_patterns(matcher):
+    matcher.add(r'say (?P<w>\S+)', 'echo first {0}')
+    matcher.add(r'say (\S+)', 'echo second {0}')
+    assert matcher.match("say hi") == "echo first hi"
+
+
+def test_invalid_pattern_is_rejected_on_add(terminal, tmp_path):
+    with pytest.raises(Exception):
+        terminal.add_nlp_pattern(r'broken (', 'pwd')
+    assert r'broken (' not in terminal.nlp_patterns
+    assert terminal.execute("current directory") == str(tmp_path)
+
+
+def test_failed_build_is_retried(matcher):
+    assert matcher.match("current directory") == "pwd"
+    # Valid alone but not inside the combined alternation; add() would have
+    # isolated a real pattern like this, so register it behind its back
+    matcher._entries.append((r'(?i)loud', 'echo', 0, None))
+    matcher._version += 1
+    for _ in range(2):
+        with pytest.raises(Exception):
+            matcher.match("current directory")
+    matcher.remove(r'(?i)loud')
+    assert matcher.match("current directory") == "pwd"
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Regression tests for rm/rmdir: the terminal's own working directory (and
+'.', '..' or anything containing it) is never removed
+"""
+
+import pytest
+
+
+@pytest.fixture
+def workdir(terminal, tmp_path):
+    (tmp_path / "work" / "sub").mkdir(parents=True)
+    terminal.execute("cd work")
+    return tmp_path / "work"
+
+
+@pytest.mark.parametrize("command", ["rm -r .", "rm -rf ./", "rm -r ..", "rm -r sub/..",
+                                     "rmdir -r .", "rmdir .", "rm -r {cwd}", "rm -r {parent}"])
+def test_refuses_to_remove_cwd(terminal, workdir, command):
+    output = terminal.execute(command.format(cwd=workdir, parent=workdir.parent))
+    assert "refusing to remove" in output
+    assert workdir.is_dir()
+    assert terminal.execute("ls") == "sub"
+
+
+def test_removes_other_directories(terminal, workdir):
+    assert "moved to trash" in terminal.execute("rm -r sub")
+    assert not (workdir / "sub").exists()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Regression tests for session eviction:
+- A terminal held by a request, job or stream is not closed by eviction
+- History shards of one-shot (cookieless) sessions are deleted on eviction
+- Terminals are built outside the manager lock, and concurrent first
+  requests for one id share a single terminal
+- Clients without cookies keep their session with the session header
+"""
+
+import os
+import threading
+import time
+
+import sessions as sessions_module
+from sessions import SessionManager, new_session_id
+
+
+def test_held_session_survives_eviction(tmp_path):
+    sessions = SessionManager(history_dir=str(tmp_path), max_sessions=1)
+    busy = new_session_id()
+    try:
+        with sessions.use(busy) as terminal:
+            terminal.execute("echo hello")
+            for _ in range(3):
+                with sessions.use(new_session_id()):
+                    pass
+            assert "echo hello" in terminal.execute("history search hello")
+            assert terminal.execute("history -c") == "History cleared"
+        # Released now, so the next request evicts it
+        with sessions.use(new_session_id()):
+            pass
+        assert len(sessions) == 1
+    finally:
+        sessions.close()
+
+
+def test_one_shot_session_history_is_removed(tmp_path):
+    sessions = SessionManager(history_dir=str(tmp_path), max_sessions=1)
+    kept, one_shot = new_session_id(), new_session_id()
+    try:
+        with sessions.use(kept, returning=False) as terminal:
+            terminal.execute("pwd")
+        # The client came back with its cookie: its history is kept
+        with sessions.use(kept) as terminal:
+            terminal.execute("pwd")
+        with sessions.use(one_shot, returning=False) as terminal:
+            terminal.execute("pwd")
+        with sessions.use(new_session_id()):
+            pass
+    finally:
+        sessions.close()
+    names = os.listdir(tmp_path)
+    assert any(name.startswith(kept) for name in names)
+    assert not any(name.startswith(one_shot) for name in names)
+
+
+def test_terminal_is_built_outside_the_lock(tmp_path, monkeypatch):
+    sessions = SessionManager(history_dir=str(tmp_path))
+    built, closed = [], []
+    real = sessions_module.UnifiedTerminal
+
+    def slow_terminal(**kwargs):
+        assert not sessions._lock.locked()
+        time.sleep(0.2)
+        terminal = real(**kwargs)
+        built.append(terminal)
+        close = terminal.close
+        terminal.close = lambda: (closed.append(terminal), close())
+        return terminal
+
+    monkeypatch.setattr(sessions_module, "UnifiedTerminal", slow_terminal)
+    session_id = new_session_id()
+    held = []
+    threads = [threading.Thread(target=lambda: held.append(sessions.acquire(session_id)))
+               for _ in range(2)]
+    try:
+        for thread in threads:
+            thread.start()
+        # Other sessions are served while those terminals are being built
+        start = time.monotonic()
+        with sessions._lock:
+            assert time.monotonic() - start < 0.1
+        for thread in threads:
+            thread.join()
+        assert held[0] is held[1] and held[0].users == 2
+        assert len(built) == 2 and closed == [t for t in built if t is not held[0].terminal]
+    finally:
+        sessions.close()
+
+
+def test_session_header_keeps_state_without_cookies(tmp_path, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "sessions", SessionManager(history_dir=str(tmp_path)))
+    client = app_module.app.test_client(use_cookies=False)
+    try:
+        response = client.post("/execute", json={"command": "cd /"})
+        session_id = response.headers[app_module.SESSION_HEADER]
+        headers = {app_module.SESSION_HEADER: session_id}
+        response = client.post("/execute", json={"command": "pwd"}, headers=headers)
+        assert response.json["output"] == os.path.abspath(os.sep)
+        assert app_module.SESSION_HEADER not in response.headers
+        # Without the header every request starts over
+        response = client.post("/execute", json={"command": "pwd"})
+        assert response.json["output"] != os.path.abspath(os.sep)
+    finally:
+        app_module.sessions.close()
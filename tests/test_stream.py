@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Regression tests for streamed system commands:
+- A command that stops producing output is killed after the timeout
+- Output resets the timeout, so a command that keeps printing runs to the end
+"""
+
+import os
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="needs a POSIX shell")
+
+
+def test_silent_command_is_killed(terminal):
+    start = time.monotonic()
+    output = "".join(terminal.stream_system_command("echo start; sleep 30", timeout=0.5))
+    assert time.monotonic() - start < 10
+    assert output == "start\nSystem command error: no output for 0.5 seconds, killed"
+
+
+def test_output_resets_the_timeout(terminal):
+    command = "for i in 1 2 3 4 5; do echo $i; sleep 0.2; done"
+    output = "".join(terminal.stream_system_command(command, timeout=0.5))
+    assert output.split() == ["1", "2", "3", "4", "5"]
+
+
+def test_keepalives_are_still_sent(terminal):
+    chunks = list(terminal.stream_system_command("sleep 0.5; echo done", idle_timeout=0.1,
+                                                 timeout=5))
+    assert "" in chunks and "".join(chunks) == "done\n"